@@ -8,6 +8,7 @@ from sqlalchemy import delete, update
 from app.core.database.base_model import Base
 from app.core.database.db import get_write_session, get_read_session
 from app.core.permissions import load_permissions
+from app.core.principal import bump_role_token_epochs, bump_token_epochs, invalidate_all_principals
 from app.admin.routes_filter import get_all_routes
 from typing import List
 
@@ -98,6 +99,16 @@ async def assign_roles_post(
 
 
 
+async def invalidate_cached_principals(model_class, id: str, db: AsyncSession):
+    """Revoke tokens and cached principals affected by an admin edit of a user, role or API key."""
+    if model_class.__tablename__ == "users":
+        await bump_token_epochs([id])
+    elif model_class.__tablename__ == "roles":
+        await bump_role_token_epochs(db, [id])
+    elif model_class.__tablename__ == "api_keys":
+        await invalidate_all_principals()
+
+
 async def get_model_instance(model_name: str, db: AsyncSession, id: int = None):
     model_class = model_mapping.get(model_name.lower())
     if model_class:
@@ -187,6 +198,7 @@ async def post_update_model(model_name: str, id: str, request: Request, db: Asyn
     form_data = await request.form()
     await db.execute(update(model_class).where(model_class.id == id).values(**form_data))
     await db.commit()
+    await invalidate_cached_principals(model_class, id, db)
     return RedirectResponse(url=f"/admin/{model_name}", status_code=status.HTTP_303_SEE_OTHER)
 
 
@@ -242,4 +254,5 @@ async def delete_model(model_name: str, id: str, request: Request, db: AsyncSess
     # Delete the record and commit the transaction
     await db.delete(db_obj)
     await db.commit()
+    await invalidate_cached_principals(model_class, id, db)
     return RedirectResponse(url=f"/admin/{model_name}", status_code=status.HTTP_303_SEE_OTHER)
@@ -30,8 +30,14 @@ router = APIRouter()
 =====================================================
 '''
 @router.get("/me", response_model=UserIdResponse, status_code=status.HTTP_200_OK, name="Auth", tags=["Auth"])
-async def me(request: Request):
+async def me(
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+):
     if hasattr(request.state, 'user'):
+        # Principals built from token claims carry no profile fields
+        if request.state.user.username is None:
+            return await AuthService(db).get_user(request.state.user.id)
         return request.state.user
     else:
         raise HTTPException(
@@ -106,6 +112,23 @@ async def logout(
     return await AuthService(db).logout_user(credentials.credentials)
 
 
+'''
+=====================================================
+# Logout All Sessions API Route
+=====================================================
+'''
+@router.post("/logout-all", status_code=status.HTTP_200_OK, name="Auth", tags=["Auth"])
+async def logout_all(
+    request: Request,
+    db: AsyncSession = Depends(get_write_session),
+):
+    if hasattr(request.state, 'user'):
+        return await AuthService(db).logout_all(request.state.user)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not authenticated")
+
+
 '''
 =====================================================
 # Forgot Password API Route
@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime, UTC
 from app.utils.mail.email import send_email
 from app.core.redis import redis_cache
+from app.core.principal import bump_token_epochs, get_token_epoch, invalidate_principals, token_claims
 from app.core.config import settings
 from sqlalchemy.future import select
 from sqlalchemy.sql import or_
@@ -60,10 +61,11 @@ class AuthService:
                 "user": {"id": str(user.id), "email": user.email}
             }
 
-        access_token = create_access_token(data={"id": str(
-            user.id), "type": "access"}, expires_delta=timedelta(days=1))
-        refresh_token = create_access_token(data={"id": str(
-            user.id), "type": "refresh"}, expires_delta=timedelta(days=7))
+        epoch = await get_token_epoch(user.id)
+        access_token = create_access_token(
+            data=await token_claims(user, epoch=epoch), expires_delta=timedelta(days=1))
+        refresh_token = create_access_token(
+            data=await token_claims(user, "refresh", epoch=epoch), expires_delta=timedelta(days=7))
         return {"detail": f"Welcome, {user.username}", "access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
     '''
@@ -118,7 +120,7 @@ class AuthService:
     '''
 
     async def verify_user(self, token: str):
-        if is_token_blacklisted(token):
+        if await is_token_blacklisted(token):
             raise HTTPException(
                 status_code=400, detail="The provided token has been blacklisted.")
         payload = decode_token(token)
@@ -135,7 +137,9 @@ class AuthService:
                 status_code=400, detail="The token has expired.")
         user.status = "active"
         await self.db.commit()
-        add_token_to_blacklist(token)
+        # Tokens issued while pending carry a stale status claim
+        await bump_token_epochs([user.id])
+        await add_token_to_blacklist(token)
         return {"detail": "User has been successfully verified."}
 
     '''
@@ -198,9 +202,33 @@ class AuthService:
     '''
 
     async def logout_user(self, token: str):
-        add_token_to_blacklist(token)
+        await add_token_to_blacklist(token)
         return {"detail": "Logout successful"}
 
+    '''
+    =====================================================
+    # Logout All Sessions Function
+    =====================================================
+    '''
+
+    async def logout_all(self, user: User):
+        await bump_token_epochs([user.id])
+        return {"detail": "Logged out from all sessions"}
+
+    '''
+    =====================================================
+    # Get User Profile Function
+    =====================================================
+    '''
+
+    async def get_user(self, user_id):
+        query = select(User).where(User.id == user_id)
+        result = await self.db.execute(query)
+        user = result.scalar_one_or_none()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
     '''
     =====================================================
     # Forgot Password Function
@@ -268,7 +296,7 @@ class AuthService:
 
     async def reset_password(self, data: ResetTokenSchema):
         token_data = data.model_dump()
-        if is_token_blacklisted(token_data["token"]):
+        if await is_token_blacklisted(token_data["token"]):
             raise HTTPException(
                 status_code=400, detail="Token has been blacklisted")
         if token_data["new_password"] != token_data["confirm_password"]:
@@ -294,7 +322,7 @@ class AuthService:
             status_code=400, detail="Passwords do not match")
         user.password = get_password_hash(token_data["new_password"])
         await self.db.commit()
-        add_token_to_blacklist(token_data["token"])
+        await add_token_to_blacklist(token_data["token"])
         return {"detail": "Password reset successful"}
 
     '''
@@ -406,7 +434,7 @@ class AuthService:
     '''
 
     async def refresh_token(self, refresh_token: str):
-        if is_token_blacklisted(refresh_token):
+        if await is_token_blacklisted(refresh_token):
             raise HTTPException(
                 status_code=400, detail="The provided token has been blacklisted.")
         payload = decode_token(refresh_token)
@@ -418,8 +446,12 @@ class AuthService:
         user = result.scalar_one_or_none()
         if not user:
             raise HTTPException(status_code=404, detail="User not found.")
-        access_token = create_access_token(data={"id": str(
-            user.id), "type": "access"}, expires_delta=timedelta(days=1))
+        epoch = await get_token_epoch(user.id)
+        if "epoch" in payload and payload["epoch"] != epoch:
+            raise HTTPException(
+                status_code=401, detail="The provided token has been revoked.")
+        access_token = create_access_token(
+            data=await token_claims(user, epoch=epoch), expires_delta=timedelta(days=1))
         return {"access_token": access_token, "token_type": "bearer"}
 
     '''
@@ -429,6 +461,7 @@ class AuthService:
     '''
 
     async def two_factor_setup(self, user: User):
+        user = await self.get_user(user.id)
         # Generate a temporary secret (not stored in DB yet)
         if user.status_2fa:
             raise HTTPException(
@@ -458,6 +491,7 @@ class AuthService:
     '''
 
     async def two_factor_verify_setup(self, user: User, data: OTPSetupSchema):
+        user = await self.get_user(user.id)
         if user.status_2fa:
             raise HTTPException(
                 status_code=400, detail="2FA is already enabled for this user")
@@ -465,15 +499,11 @@ class AuthService:
         if not totp.verify(data.otp_code):
             raise HTTPException(
                 status_code=400, detail="Invalid OTP. Please try again.")
-        query = select(User).where(User.id == user.id)
-        result = await self.db.execute(query)
-        user = result.scalar_one_or_none()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
         # ✅ OTP is correct → Enable 2FA
         user.status_2fa = True
         user.secret_2fa = data.secret
         await self.db.commit()
+        await invalidate_principals(user_ids=[user.id])
 
         return {"detail": "2FA enabled successfully!"}
 
@@ -496,10 +526,11 @@ class AuthService:
         if not totp.verify(data.otp_code):
             raise HTTPException(
                 status_code=400, detail="Invalid OTP. Please try again.")
-        access_token = create_access_token(data={"id": str(
-            user.id), "type": "access"}, expires_delta=timedelta(days=1))
-        refresh_token = create_access_token(data={"id": str(
-            user.id), "type": "refresh"}, expires_delta=timedelta(days=7))
+        epoch = await get_token_epoch(user.id)
+        access_token = create_access_token(
+            data=await token_claims(user, epoch=epoch), expires_delta=timedelta(days=1))
+        refresh_token = create_access_token(
+            data=await token_claims(user, "refresh", epoch=epoch), expires_delta=timedelta(days=7))
         return {"detail": f"Welcome, {user.username}", "access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
     '''
@@ -520,6 +551,7 @@ class AuthService:
         user.status_2fa = False
         user.secret_2fa = None
         await self.db.commit()
+        await invalidate_principals(user_ids=[user.id])
         return {"detail": "2FA disabled successfully!"}
 
     '''
@@ -573,6 +605,7 @@ class AuthService:
 
         await self.db.delete(api_key)
         await self.db.commit()
+        await invalidate_principals(api_keys=[api_key.key])
         return {"detail": "API Key removed successfully"}
 
     '''
@@ -1,6 +1,7 @@
 from sqlalchemy import String, Integer, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database.base_model import Base
+from app.core.cache_policy import REFERENCE_CACHE_POLICY
 
 class Country(Base):
     __tablename__ = "countries"
@@ -10,6 +11,7 @@ class Country(Base):
     # Relationships
     states: Mapped[list["State"]] = relationship("State", back_populates="country")
     __allowed__ = True  
+    __cache__ = REFERENCE_CACHE_POLICY
 
 
 class State(Base):
@@ -22,6 +24,7 @@ class State(Base):
     country: Mapped["Country"] = relationship("Country", back_populates="states")
     districts: Mapped[list["District"]] = relationship("District", back_populates="state")
     __allowed__ = True  
+    __cache__ = REFERENCE_CACHE_POLICY
 
 
 class District(Base):
@@ -33,3 +36,4 @@ class District(Base):
     # Relationships
     state: Mapped["State"] = relationship("State", back_populates="districts")
     __allowed__ = True  
+    __cache__ = REFERENCE_CACHE_POLICY
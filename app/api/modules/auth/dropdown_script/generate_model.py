@@ -8,6 +8,7 @@ def generate_models_file(hierarchy_config: dict, output_path: str = None):
 from sqlalchemy import String, Integer, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database.base_model import Base
+from app.core.cache_policy import REFERENCE_CACHE_POLICY
 
 """
     
@@ -20,6 +21,7 @@ class {class_name}(Base):
     # Relationships
 {relationships}
     __allowed__ = True  
+    __cache__ = REFERENCE_CACHE_POLICY
 """
     
     relationship_template = "    {rel_name}: Mapped[list[\"{target_class}\"]] = relationship(\"{target_class}\", back_populates=\"{back_populates}\")"
@@ -2,6 +2,7 @@ from typing import List
 from sqlalchemy import String, select
 from sqlalchemy.orm import relationship
 from app.core.database.base_model import Base
+from app.core.principal import bump_role_token_epochs, invalidate_principals, role_user_ids
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import event
 from sqlalchemy.orm import Session
@@ -44,6 +45,7 @@ class Role(Base):
     '''
     @classmethod
     async def update(cls, session: AsyncSession, data_list: List[any]):
+        renamed_ids, edited_ids = [], []
         for data in data_list:
             # Check if the role is reserved
             existing_role = await session.execute(select(Role).where(Role.id == data.id))
@@ -52,7 +54,15 @@ class Role(Base):
                 raise ValueError(f"Cannot modify reserved role: {existing_role.name}")
             data.name = data.name.upper()
             data.description = data.description or "Default description"
-        return await super().update(session, data_list)
+            if existing_role and existing_role.name != data.name:
+                renamed_ids.append(data.id)
+            else:
+                edited_ids.append(data.id)
+        updated_count = await super().update(session, data_list)
+        # Tokens carry the role name: only a rename revokes them, other edits refresh cached principals
+        await bump_role_token_epochs(session, renamed_ids)
+        await invalidate_principals(user_ids=await role_user_ids(session, edited_ids))
+        return updated_count
 
 '''
 =====================================================
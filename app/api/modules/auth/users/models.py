@@ -5,6 +5,8 @@ from app.utils.avatar import generate_pixel_avatar
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database.base_model import Base
+from app.core.cache_policy import CachePolicy
+from app.core.principal import bump_token_epochs, invalidate_principals
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
 from pydantic import BaseModel
@@ -45,6 +47,8 @@ class User(Base):
     secret_2fa: Mapped[str] = mapped_column(String, nullable=True)
     
     __allowed__ = True
+    # Users change often (logins, status, 2FA), keep entries short-lived
+    __cache__ = CachePolicy(list_ttl=30, detail_ttl=30, stale_ttl=0)
 
     '''
     =====================================================
@@ -103,4 +107,44 @@ class User(Base):
 
             processed_data.append({"id": obj_id, **data})
 
-        return await super().update(session, processed_data)
+        # Status and role changes revoke issued tokens (they carry both as claims)
+        claim_ids = [data["id"] for data in processed_data if "status" in data or "role_id" in data]
+        current = {}
+        if claim_ids:
+            result = await session.execute(
+                select(User.id, User.status, User.role_id).where(User.id.in_(claim_ids)))
+            current = {str(row.id): row for row in result.all()}
+
+        def claims_changed(data: dict) -> bool:
+            row = current.get(str(data["id"]))
+            if row is None:
+                return False
+            return any(
+                field in data and str(getattr(data[field], "value", data[field])) != str(getattr(row, field))
+                for field in ("status", "role_id")
+            )
+
+        revoked_ids = [data["id"] for data in processed_data if claims_changed(data)]
+        changed_ids = [data["id"] for data in processed_data if data["id"] not in revoked_ids]
+
+        updated_count = await super().update(session, processed_data)
+        await bump_token_epochs(revoked_ids)
+        await invalidate_principals(user_ids=changed_ids)
+        return updated_count
+
+    '''
+    =====================================================
+    # Delete methods for User table (revoke tokens and cached principals)
+    =====================================================
+    '''
+    @classmethod
+    async def soft_delete(cls, session: AsyncSession, ids: List[uuid.UUID]):
+        deleted_count = await super().soft_delete(session, ids)
+        await bump_token_epochs(ids)
+        return deleted_count
+
+    @classmethod
+    async def hard_delete(cls, session: AsyncSession, ids: List[uuid.UUID]):
+        deleted_count = await super().hard_delete(session, ids)
+        await bump_token_epochs(ids)
+        return deleted_count
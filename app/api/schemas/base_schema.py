@@ -60,7 +60,14 @@ class BaseResponseModel(BaseModel):
 T = TypeVar("T")
 class Page(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int] = Field(None, description="Matching records, None with count=none")
     page: int
     size: int
-    pages: int
\ No newline at end of file
+    pages: Optional[int] = None
+    total_exact: bool = Field(True, description="False when total and pages are planner estimates or omitted")
+
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    size: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
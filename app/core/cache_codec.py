@@ -0,0 +1,189 @@
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+import json
+import struct
+import zlib
+from logs.logging import logger
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+'''
+=====================================================
+# Cache value wire format
+=====================================================
+
+Version 1 (legacy): plain JSON text, no header.
+Version 2: MAGIC | version | codec id | compression id | payload
+Version 3: version 2 header | fresh_until (float64, epoch seconds) | payload
+
+MAGIC (0xFC) can never start a JSON document, so readers tell both formats
+apart without a flag and understand every version regardless of what they
+write. Roll a new format out by deploying readers first, then switching
+`REDIS_CACHE_FORMAT`.
+'''
+MAGIC = 0xFC
+FORMAT_LEGACY = 1
+FORMAT_BINARY = 2
+FORMAT_FRESHNESS = 3
+HEADER_SIZE = 4
+FRESHNESS = struct.Struct(">d")
+RAW_CODEC_ID = 0  # Payload is stored bytes, e.g. an already serialized response body
+
+
+class CacheDecodeError(ValueError):
+    """Raised when a cached value was written with a codec this worker lacks."""
+
+
+'''
+=====================================================
+# Codecs (id -> name, encode, decode)
+=====================================================
+'''
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+CODECS: Dict[str, Tuple[int, Optional[Callable[[Any], bytes]], Optional[Callable[[bytes], Any]]]] = {
+    "json": (1, _json_dumps, json.loads),
+    "orjson": (2, orjson.dumps, orjson.loads) if orjson else (2, None, None),
+    "msgpack": (
+        (3, lambda value: msgpack.packb(value, use_bin_type=True),
+         lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False))
+        if msgpack else (3, None, None)
+    ),
+}
+_CODECS_BY_ID = {codec_id: (name, encode, decode) for name, (codec_id, encode, decode) in CODECS.items()}
+
+'''
+=====================================================
+# Compressions (id -> name, compress, decompress)
+=====================================================
+'''
+def _gzip(data: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+COMPRESSIONS: Dict[str, Tuple[int, Optional[Callable[[bytes], bytes]], Optional[Callable[[bytes], bytes]]]] = {
+    "none": (0, lambda data: data, lambda data: data),
+    # wbits=31 produces a gzip member, so the payload can also be served as-is with `Content-Encoding: gzip`
+    "gzip": (1, _gzip, lambda data: zlib.decompress(data, 31)),
+    "zstd": (
+        (2, zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress)
+        if zstandard else (2, None, None)
+    ),
+}
+_COMPRESSIONS_BY_ID = {comp_id: (name, compress, decompress) for name, (comp_id, compress, decompress) in COMPRESSIONS.items()}
+
+
+'''
+=====================================================
+# Decoded cache entries
+=====================================================
+'''
+class RawBody(NamedTuple):
+    """Stored bytes, left compressed as they were cached (`encoding` is the Content-Encoding)."""
+    data: bytes
+    encoding: Optional[str] = None
+
+    def decompressed(self) -> bytes:
+        if self.encoding is None:
+            return self.data
+        return COMPRESSIONS[self.encoding][2](self.data)
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    fresh_until: Optional[float] = None
+
+
+def _available(table: dict, name: str, fallback: str, kind: str) -> str:
+    if name in table and table[name][1] is not None:
+        return name
+    logger.warning(f"Redis cache {kind} '{name}' is not available, using '{fallback}'")
+    return fallback
+
+
+'''
+=====================================================
+# Encoder / decoder for RedisCache values
+=====================================================
+'''
+class CacheCodec:
+    def __init__(self, codec: str = "json", compression: str = "none",
+                 compress_threshold: int = 1024, write_format: int = FORMAT_BINARY):
+        self.codec = _available(CODECS, codec, "json", "codec")
+        self.compression = _available(COMPRESSIONS, compression, "none", "compression")
+        self.compress_threshold = compress_threshold
+        self.write_format = write_format
+
+    def encode(self, value: Any, fresh_until: Optional[float] = None, raw: bool = False,
+               compress_threshold: Optional[int] = None) -> bytes:
+        """
+        Serialize a value in the configured write format. `raw` stores bytes
+        as-is (compressed above the threshold). Raw values and `fresh_until`
+        always use the binary frame, whatever the write format, so they must
+        only be stored under key names that format 1 readers never look up.
+        """
+        if self.write_format == FORMAT_LEGACY and fresh_until is None and not raw:
+            return _json_dumps(value)
+
+        if raw:
+            codec_id, payload = RAW_CODEC_ID, bytes(value)
+        else:
+            codec_id, encode, _ = CODECS[self.codec]
+            payload = encode(value)
+        comp_id = 0
+        threshold = self.compress_threshold if compress_threshold is None else compress_threshold
+        if self.compression != "none" and len(payload) >= threshold:
+            comp_id, compress, _ = COMPRESSIONS[self.compression]
+            payload = compress(payload)
+
+        if fresh_until is None:
+            return bytes((MAGIC, FORMAT_BINARY, codec_id, comp_id)) + payload
+        return bytes((MAGIC, FORMAT_FRESHNESS, codec_id, comp_id)) + FRESHNESS.pack(fresh_until) + payload
+
+    def decode_entry(self, data: Optional[bytes]) -> Optional[CacheEntry]:
+        """Deserialize a value written in any known format, with its freshness deadline."""
+        if not data:
+            return None
+        if data[0] != MAGIC:
+            return CacheEntry(json.loads(data))
+
+        version, codec_id, comp_id = data[1], data[2], data[3]
+        if version == FORMAT_BINARY:
+            fresh_until, offset = None, HEADER_SIZE
+        elif version == FORMAT_FRESHNESS:
+            fresh_until, = FRESHNESS.unpack_from(data, HEADER_SIZE)
+            offset = HEADER_SIZE + FRESHNESS.size
+        else:
+            raise CacheDecodeError(f"unknown cache format version {version}")
+
+        compression = _COMPRESSIONS_BY_ID.get(comp_id)
+        if compression is None or compression[2] is None:
+            raise CacheDecodeError(f"unsupported cache compression {comp_id}")
+        if codec_id == RAW_CODEC_ID:
+            # Left compressed so it can be sent with a matching Content-Encoding
+            return CacheEntry(RawBody(data[offset:], compression[0] if comp_id else None), fresh_until)
+
+        codec = _CODECS_BY_ID.get(codec_id)
+        if codec is None or codec[2] is None:
+            raise CacheDecodeError(f"unsupported cache codec {codec_id}")
+        return CacheEntry(codec[2](compression[2](data[offset:])), fresh_until)
+
+    def decode(self, data: Optional[bytes]) -> Any:
+        """Deserialize a value written in any known format."""
+        entry = self.decode_entry(data)
+        return entry.value if entry else None
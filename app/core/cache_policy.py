@@ -0,0 +1,34 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional
+
+'''
+=====================================================
+# Declarative cache policy for generated CRUD routes
+=====================================================
+'''
+class CachePolicy(BaseModel):
+    """
+    Declared on a model next to `__allowed__`, e.g.
+    `__cache__ = CachePolicy(list_ttl=6 * 3600, detail_ttl=6 * 3600)`.
+    """
+    read_all: bool = Field(True, description="Cache list pages")
+    read_one: bool = Field(True, description="Cache single records")
+    list_ttl: int = Field(300, description="Seconds a list page stays fresh")
+    stale_ttl: int = Field(60, description="Seconds a stale list is still served while it is refreshed")
+    detail_ttl: int = Field(300, description="Seconds a serialized record stays cached")
+    max_page_size: int = Field(200, description="Larger pages are not cached")
+    update_lists: bool = Field(False, description="Updates also invalidate list pages and totals (order, filters), not only rows")
+    compress_threshold: Optional[int] = Field(None, description="Bytes above which entries are compressed, None for the global setting")
+
+    model_config = ConfigDict(frozen=True)
+
+
+DEFAULT_CACHE_POLICY = CachePolicy()
+
+# Reference data that rarely changes: cached for hours, so every write (updates
+# included) invalidates its lists, not only the changed rows
+REFERENCE_CACHE_POLICY = CachePolicy(list_ttl=6 * 3600, detail_ttl=6 * 3600, stale_ttl=600, update_lists=True)
+
+
+def get_cache_policy(model) -> CachePolicy:
+    return getattr(model, "__cache__", None) or DEFAULT_CACHE_POLICY
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     app_name:str
@@ -35,6 +36,28 @@ class Settings(BaseSettings):
     minio_bucket: str
 
     redis_url: str
+
+    # Redis cache values: codec json|orjson|msgpack, compression none|gzip|zstd.
+    # Format 1 writes legacy plain JSON (readable by older workers), format 2 the
+    # binary frame. Roll out in two steps: deploy with 1, then switch to 2 once
+    # every worker runs this release.
+    redis_cache_codec: str = "json"
+    redis_cache_compression: str = "gzip"
+    redis_cache_compress_threshold: int = 1024
+    redis_cache_format: int = 1
+
+    # Per-process L1 in front of Redis for hot keys (opt-in per call)
+    redis_l1_enabled: bool = True
+    redis_l1_ttl: float = 5.0
+    redis_l1_max_entries: int = 10000
+    redis_l1_max_bytes: int = 32 * 1024 * 1024
+
+    # Rate limiting, rates are "<count>/<second|minute|hour|day>"
+    rate_limit_enabled: bool = True
+    rate_limit_roles: Dict[str, str] = {}
+    rate_limit_routes: Dict[str, str] = {"POST /api/auth/login": "10/minute"}
+    rate_limit_api_key: Optional[str] = None
+    rate_limit_client: Optional[str] = "300/minute"  # Per client IP, checked before authentication
     
     environment: str
 
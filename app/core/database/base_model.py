@@ -1,9 +1,10 @@
-from sqlalchemy import UUID, DateTime, String, asc, delete, desc, func, or_, select, update
+from sqlalchemy import UUID, DateTime, String, any_, asc, cast, delete, desc, func, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.declarative import as_declarative, declarative_base
 from sqlalchemy.orm import mapped_column, Mapped
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils.filtering import parse_filter_query, parse_filters, resolve_and_join_column
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 from fastapi import HTTPException
 import uuid
 
@@ -129,6 +130,22 @@ class Base:
         result = await session.execute(query)
         return result.scalar_one_or_none()
 
+    '''
+    =====================================================
+    # Get non-deleted records by IDs in one query (id = ANY(array), one plan for any count).
+    =====================================================
+    '''
+    @classmethod
+    async def get_records_by_ids(cls, session: AsyncSession, record_ids: List[uuid.UUID]) -> List:
+        if not record_ids:
+            return []
+        query = select(cls).where(
+            cls.deleted_at.is_(None),
+            cls.id == any_(cast(list(record_ids), ARRAY(UUID(as_uuid=True)))),
+        )
+        result = await session.execute(query)
+        return result.scalars().all()
+
     '''
     =====================================================
     # Build and execute dynamic queries with filtering, sorting, search, and relationships.
@@ -142,6 +159,24 @@ class Base:
         sort: Optional[str] = None,
         search: Optional[str] = None,
     ) -> List:
+        query, column, descending = await cls.get_sorted_records(filters, sort, search)
+        if column is not None:
+            query = query.order_by(desc(column) if descending else asc(column))
+        return query
+
+    '''
+    =====================================================
+    # Same query without ORDER BY, with the resolved sort column (None without sort)
+    # and direction, so callers can order and seek on it themselves (keyset pagination).
+    =====================================================
+    '''
+    @classmethod
+    async def get_sorted_records(
+        cls,
+        filters: Optional[str] = None,
+        sort: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> Tuple[Any, Optional[Any], bool]:
         query = select(cls).where(cls.deleted_at.is_(None))
 
         parsed_filters = parse_filter_query(filters)
@@ -159,26 +194,24 @@ class Base:
             if search_expression:
                 query = query.where(or_(*search_expression))
 
-        if sort:
-            try:
-                sort_field, sort_direction = sort.split(":")
-            except ValueError:
-                sort_field, sort_direction = sort, "asc"
-
-            column = getattr(cls, sort_field, None)
-            if column is None:
-                nested_keys = sort_field.split("__")
-                if len(nested_keys) > 1:
-                    joins = {}
-                    column, query = resolve_and_join_column(cls, nested_keys, query, joins)
-                else:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid sort field: {sort_field}"
-                    )
-
-            query = query.order_by(
-                asc(column) if sort_direction.lower() == "asc" else desc(column)
-            )
-
-        return query
\ No newline at end of file
+        if not sort:
+            return query, None, False
+
+        try:
+            sort_field, sort_direction = sort.split(":")
+        except ValueError:
+            sort_field, sort_direction = sort, "asc"
+
+        column = getattr(cls, sort_field, None)
+        if column is None:
+            nested_keys = sort_field.split("__")
+            if len(nested_keys) > 1:
+                joins = {}
+                column, query = resolve_and_join_column(cls, nested_keys, query, joins)
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid sort field: {sort_field}"
+                )
+
+        return query, column, sort_direction.lower() != "asc"
@@ -0,0 +1,178 @@
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, attributes
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+from sqlalchemy.util import await_only
+from sqlalchemy.util.concurrency import in_greenlet
+from app.core.database.base_model import Base
+from app.core.cache_policy import get_cache_policy
+from app.core.redis import redis_cache
+from logs.logging import logger
+from typing import Dict, Iterable, List, Optional, Set
+import uuid
+
+CACHE_CHANGES = "cache_changes"  # session.info key holding the changes of the open transaction
+
+'''
+=====================================================
+# Cache keys of generated CRUD routes
+=====================================================
+'''
+def canonical_id(id) -> str:
+    """Ids as `str(UUID)`, so every spelling of one UUID maps to the same cache key."""
+    try:
+        return str(id if isinstance(id, uuid.UUID) else uuid.UUID(str(id)))
+    except ValueError:
+        return str(id)  # Not a UUID (e.g. a "*" pattern)
+
+
+def detail_key(model, id) -> str:
+    # Not `{model}_detail_{id}`: older workers read that name as JSON, this entry is a raw body
+    return f"{model.__name__.lower()}_detail_body_{canonical_id(id)}"
+
+
+def item_key(model, id) -> str:
+    return f"{model.__name__.lower()}_item_{canonical_id(id)}"
+
+
+def list_namespace(model) -> str:
+    return f"{model.__name__.lower()}_list"
+
+
+def data_namespace(model) -> str:
+    # Bumped by every write, for entries that embed row data (projected list pages)
+    return f"{model.__name__.lower()}_data"
+
+
+'''
+=====================================================
+# Changes collected per transaction
+=====================================================
+'''
+class CacheChanges:
+    def __init__(self):
+        self.rows: Dict[type, Set] = {}  # model -> changed ids (row entries to drop)
+        self.lists: Set[type] = set()  # models whose list membership changed
+        self.whole: Set[type] = set()  # models changed by statements we could not narrow to ids
+
+    def add_rows(self, model, ids: Iterable):
+        self.rows.setdefault(model, set()).update(canonical_id(id) for id in ids)
+
+    def __bool__(self):
+        return bool(self.rows or self.lists or self.whole)
+
+
+def _changes(session: Session) -> CacheChanges:
+    changes = session.info.get(CACHE_CHANGES)
+    if changes is None:
+        changes = session.info[CACHE_CHANGES] = CacheChanges()
+    return changes
+
+
+def _statement_ids(model, whereclause) -> Optional[List]:
+    """Ids a bulk UPDATE/DELETE is restricted to (`id = x` / `id IN (...)` in a top-level AND), or None."""
+    if whereclause is None:
+        return None
+    conjuncts = [whereclause]
+    while conjuncts:
+        clause = conjuncts.pop()
+        if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+            conjuncts.extend(clause.clauses)
+            continue
+        if not isinstance(clause, BinaryExpression) or not isinstance(clause.right, BindParameter):
+            continue
+        left = clause.left
+        if getattr(left, "table", None) is not model.__table__ or getattr(left, "key", None) != "id":
+            continue
+        value = clause.right.effective_value
+        if clause.operator is operators.eq and value is not None:
+            return [value]
+        if clause.operator is operators.in_op and isinstance(value, (list, tuple)):
+            return list(value)
+    return None
+
+
+'''
+=====================================================
+# Session event hooks
+=====================================================
+'''
+def _after_flush(session: Session, flush_context):
+    changes = _changes(session)
+    for obj in session.new:
+        if isinstance(obj, Base):
+            changes.lists.add(type(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Base):
+            changes.add_rows(type(obj), [obj.id])
+            changes.lists.add(type(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Base) and session.is_modified(obj):
+            changes.add_rows(type(obj), [obj.id])
+            # Soft deletes change list membership, other updates may change order and filters
+            if get_cache_policy(type(obj)).update_lists or attributes.get_history(obj, "deleted_at").has_changes():
+                changes.lists.add(type(obj))
+
+
+def _do_orm_execute(orm_execute_state: ORMExecuteState):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    model = mapper.class_ if mapper is not None else None
+    if model is None or not issubclass(model, Base):
+        return
+
+    statement = orm_execute_state.statement
+    changes = _changes(orm_execute_state.session)
+    ids = _statement_ids(model, statement.whereclause)
+    if ids is None:
+        changes.whole.add(model)
+    else:
+        changes.add_rows(model, ids)
+
+    values = getattr(statement, "_values", None) or {}
+    if (orm_execute_state.is_delete or get_cache_policy(model).update_lists
+            or any(getattr(key, "key", key) == "deleted_at" for key in values)):
+        changes.lists.add(model)
+
+
+async def _invalidate(changes: CacheChanges):
+    """Drop every changed row entry and bump list/data generations in one round trip."""
+    async with redis_cache.pipeline() as pipe:
+        keys = [key for model, ids in changes.rows.items() for id in ids
+                for key in (detail_key(model, id), item_key(model, id))]
+        pipe.unlink(*keys)
+        for model in changes.lists | changes.whole:
+            pipe.bump_generation(list_namespace(model))
+        for model in changes.rows.keys() | changes.lists | changes.whole:
+            pipe.bump_generation(data_namespace(model))
+    for model in changes.whole:
+        # Rows unknown: fall back to a pattern delete (rare, e.g. filtered bulk updates)
+        await redis_cache.delete_many([detail_key(model, "*"), item_key(model, "*")])
+
+
+def _after_commit(session: Session):
+    changes = session.info.pop(CACHE_CHANGES, None)
+    if not changes:
+        return
+    if redis_cache.redis is None or not in_greenlet():
+        # Sync sessions (e.g. seeding roles in create_all, before Redis connects) have
+        # no cached routes to invalidate and cannot await
+        return
+    try:
+        # Commits of an AsyncSession run inside its greenlet, so the Redis call can be awaited here
+        await_only(_invalidate(changes))
+    except Exception as e:
+        logger.error(f"Cache invalidation after commit failed: {e}")
+
+
+def _after_rollback(session: Session):
+    session.info.pop(CACHE_CHANGES, None)
+
+
+def register_cache_invalidation():
+    """Invalidate generated route caches for every row written through an ORM session."""
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
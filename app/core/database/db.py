@@ -1,7 +1,11 @@
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from typing import AsyncGenerator
+from app.core.timing import instrument_engine
+from app.core.database.cache_invalidation import register_cache_invalidation
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, Dict, Optional
 
 
 def create_engine(url, **kwargs):
@@ -15,17 +19,62 @@ slave_db_engine = create_engine(
     pool_size=10, max_overflow=20, pool_recycle=3600, pool_timeout=30, pool_pre_ping=True
 )
 
+# Record query time per request (Server-Timing "db" phase)
+instrument_engine(master_db_engine)
+instrument_engine(slave_db_engine)
+
+# Drop cached rows and lists after every commit that changed them
+register_cache_invalidation()
+
 # Async session factories
 async_master_session = async_sessionmaker(
     bind=master_db_engine, autocommit=False, autoflush=False, expire_on_commit=False)
 async_slave_session = async_sessionmaker(
     bind=slave_db_engine, autocommit=False, autoflush=False)
 
+# Sessions opened during the current request, keyed by "read"/"write"
+_request_sessions: ContextVar[Optional[Dict[str, AsyncSession]]] = ContextVar(
+    "request_sessions", default=None)
+
+
+@asynccontextmanager
+async def request_session_scope():
+    """
+    Share database sessions across a request.
+    Sessions are opened lazily on first use (by the middleware or a route
+    dependency) and closed, returning their connection to the pool, when
+    the scope exits after the response has been sent.
+    """
+    registry: Dict[str, AsyncSession] = {}
+    token = _request_sessions.set(registry)
+    try:
+        yield registry
+    finally:
+        _request_sessions.reset(token)
+        for session in registry.values():
+            await session.close()
+
+
+def _request_session(name: str, factory: async_sessionmaker) -> Optional[AsyncSession]:
+    """Return the request's session for `name`, opening it on first use."""
+    registry = _request_sessions.get()
+    if registry is None:
+        return None  # Outside a request (startup, background tasks)
+    session = registry.get(name)
+    if session is None:
+        session = registry[name] = factory()
+    return session
+
 
 async def get_write_session() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency to provide a database session.
+    Reuses the request-scoped session when one is active.
     """
+    session = _request_session("write", async_master_session)
+    if session is not None:
+        yield session
+        return
     async with async_master_session() as session:
         yield session
 
@@ -33,6 +82,11 @@ async def get_write_session() -> AsyncGenerator[AsyncSession, None]:
 async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency to provide a database session.
+    Reuses the request-scoped session when one is active.
     """
+    session = _request_session("read", async_slave_session)
+    if session is not None:
+        yield session
+        return
     async with async_slave_session() as session:
         yield session
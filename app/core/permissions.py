@@ -2,14 +2,24 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from app.api.modules.auth.roles_permission.models import RolePermission
+from app.utils.route_matcher import PermissionMatcher
 from app.core.redis import redis_cache
+from logs.logging import logger
+import uuid
 
-PERMISSION_CACHE_KEY = "permission_cache"  # Redis key to store permissions
+PERMISSION_CACHE_KEY = "permission_cache"  # Legacy role -> route -> methods map, still read by older workers
+PERMISSION_SNAPSHOT_KEY = "permission_snapshot"  # Versioned snapshot read by this release
+PERMISSION_VERSION_KEY = "permission_cache_version"  # Snapshot version (restarts at 1 if Redis is flushed)
+PERMISSION_CHANNEL = "permission_cache_updates"  # Pub/Sub channel for version bumps
+
+# In-process permission snapshot held by each worker
+_snapshot = {"version": None, "matcher": PermissionMatcher()}
 
 
 async def load_permissions(db: AsyncSession):
     """
-    Load permissions from the database and store them in Redis cache.
+    Load permissions from the database, store them in Redis cache under a new
+    version and notify every worker to reload.
     """
     query = select(RolePermission).options(selectinload(RolePermission.role))
     result = await db.execute(query)
@@ -29,5 +39,49 @@ async def load_permissions(db: AsyncSession):
         if method not in temp_cache[role][route]:
             temp_cache[role][route].append(method)
 
-    # Store in Redis with an expiration of 10 minutes (600 seconds)
-    await redis_cache.set(PERMISSION_CACHE_KEY, temp_cache, ttl=600)
+    # The nonce keeps versions unique even if the counter restarts after a Redis flush
+    version = f"{await redis_cache.incr(PERMISSION_VERSION_KEY)}:{uuid.uuid4().hex}"
+
+    # Store in Redis with an expiration of 10 minutes (600 seconds). The legacy key keeps
+    # its plain map so workers of older releases keep authorising during a rolling deploy
+    async with redis_cache.pipeline() as pipe:
+        pipe.set(PERMISSION_CACHE_KEY, temp_cache, ttl=600)
+        pipe.set(PERMISSION_SNAPSHOT_KEY, {"version": version, "permissions": temp_cache}, ttl=600)
+    _apply_snapshot(version, temp_cache)
+
+    await redis_cache.publish(PERMISSION_CHANNEL, version)
+
+
+def _apply_snapshot(version: str, permission_data: dict):
+    """
+    Compile a permission snapshot unless it is the one already loaded. Versions
+    are compared for equality only: the counter restarts when Redis is flushed,
+    and Redis always holds the current snapshot.
+    """
+    if version != _snapshot["version"]:
+        _snapshot["version"] = version
+        _snapshot["matcher"] = PermissionMatcher(permission_data)
+
+
+async def sync_permissions():
+    """Reload the in-process snapshot from Redis if its version differs."""
+    payload = await redis_cache.get(PERMISSION_SNAPSHOT_KEY)
+    if payload and payload.get("version") is not None:
+        _apply_snapshot(payload["version"], payload.get("permissions"))
+
+
+async def watch_permissions():
+    """Reload permissions whenever another worker publishes a version bump."""
+    async for version in redis_cache.subscribe(PERMISSION_CHANNEL):
+        if version is not None and version == _snapshot["version"]:
+            continue
+        try:
+            await sync_permissions()
+            logger.info(f"[*] Role Permissions reloaded (version {_snapshot['version']})")
+        except Exception as e:
+            logger.error(f"Error reloading permissions: {e}")
+
+
+def get_permission_matcher() -> PermissionMatcher:
+    """Return the compiled matcher for this worker's permission snapshot."""
+    return _snapshot["matcher"]
@@ -0,0 +1,195 @@
+from pydantic import BaseModel, ConfigDict
+from app.utils.ttl_cache import TTLCache
+from app.core.redis import redis_cache
+from sqlalchemy import select
+from datetime import datetime
+from typing import Iterable, Optional
+import uuid
+
+PRINCIPAL_TTL = 300  # Redis TTL for cached principals (seconds)
+LOCAL_PRINCIPAL_TTL = 30  # In-process TTL, bounds staleness if an invalidation is missed
+LOCAL_PRINCIPAL_MAXSIZE = 10000
+PRINCIPAL_CHANNEL = "principal_cache_updates"  # Pub/Sub channel for invalidations
+
+_local_principals = TTLCache(maxsize=LOCAL_PRINCIPAL_MAXSIZE, ttl=LOCAL_PRINCIPAL_TTL)
+
+
+'''
+=====================================================
+# Authenticated principal (non-sensitive view of a user)
+=====================================================
+'''
+class PrincipalRole(BaseModel):
+    id: Optional[uuid.UUID] = None
+    name: str
+    description: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class Principal(BaseModel):
+    id: uuid.UUID
+    status: str
+    username: Optional[str] = None
+    email: Optional[str] = None
+    avatar: Optional[str] = None
+    status_2fa: Optional[bool] = None
+    role_id: Optional[uuid.UUID] = None
+    role: Optional[PrincipalRole] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+def _user_key(user_id) -> str:
+    return f"principal:user:{user_id}"
+
+
+def _api_key_key(hashed_key: str) -> str:
+    return f"principal:api_key:{hashed_key}"
+
+
+'''
+=====================================================
+# Principal cache lookups (in-process LRU, then Redis)
+=====================================================
+'''
+async def get_cached_principal(user_id) -> Optional[Principal]:
+    key = _user_key(user_id)
+    principal = _local_principals.get(key)
+    if principal is None:
+        data = await redis_cache.get(key)
+        if data:
+            principal = Principal.model_validate(data)
+            _local_principals.set(key, principal)
+    return principal
+
+
+async def cache_principal(principal: Principal):
+    key = _user_key(principal.id)
+    _local_principals.set(key, principal)
+    await redis_cache.set(key, principal.model_dump(mode="json"), ttl=PRINCIPAL_TTL)
+
+
+async def get_cached_api_key_principal(hashed_key: str) -> Optional[Principal]:
+    key = _api_key_key(hashed_key)
+    user_id = _local_principals.get(key)
+    if user_id is None:
+        user_id = await redis_cache.get(key)
+        if not user_id:
+            return None
+        _local_principals.set(key, user_id)
+    return await get_cached_principal(user_id)
+
+
+async def cache_api_key_principal(hashed_key: str, principal: Principal):
+    key = _api_key_key(hashed_key)
+    _local_principals.set(key, str(principal.id))
+    await redis_cache.set(key, str(principal.id), ttl=PRINCIPAL_TTL)
+    await cache_principal(principal)
+
+
+'''
+=====================================================
+# Principal cache invalidation
+=====================================================
+'''
+def _invalidate(pipe, keys: list):
+    """Queue the eviction of principal keys (locally, in Redis and on other workers)."""
+    for key in keys:
+        _local_principals.delete(key)
+    pipe.unlink(*keys)
+    pipe.publish(PRINCIPAL_CHANNEL, {"keys": keys})
+
+
+async def invalidate_principals(user_ids: Iterable = (), api_keys: Iterable[str] = ()):
+    keys = [_user_key(user_id) for user_id in user_ids] + [_api_key_key(key) for key in api_keys]
+    if not keys:
+        return
+    async with redis_cache.pipeline() as pipe:
+        _invalidate(pipe, keys)
+
+
+async def invalidate_all_principals():
+    _local_principals.clear()
+    await redis_cache.delete_pattern("principal:*")
+    await redis_cache.publish(PRINCIPAL_CHANNEL, {"all": True})
+
+
+async def watch_principals():
+    """Evict principals invalidated by other workers."""
+    async for message in redis_cache.subscribe(PRINCIPAL_CHANNEL):
+        # Anything may have changed while we were not subscribed
+        if message is None or message.get("all"):
+            _local_principals.clear()
+            continue
+        for key in message.get("keys", []):
+            _local_principals.delete(key)
+
+
+'''
+=====================================================
+# Per-user token epoch (revokes every token issued before a bump)
+=====================================================
+'''
+def _epoch_key(user_id) -> str:
+    return f"token_epoch:{user_id}"
+
+
+async def get_token_epoch(user_id) -> int:
+    return int(await redis_cache.get(_epoch_key(user_id)) or 0)
+
+
+async def bump_token_epochs(user_ids: Iterable):
+    """Revoke all outstanding tokens of the given users and drop their cached principals."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    async with redis_cache.pipeline() as pipe:
+        for user_id in user_ids:
+            pipe.incr(_epoch_key(user_id))
+        _invalidate(pipe, [_user_key(user_id) for user_id in user_ids])
+
+
+async def role_user_ids(session, role_ids: Iterable) -> list:
+    from app.api.modules.auth.users.models import User
+
+    role_ids = list(role_ids)
+    if not role_ids:
+        return []
+    result = await session.execute(select(User.id).where(User.role_id.in_(role_ids)))
+    return result.scalars().all()
+
+
+async def bump_role_token_epochs(session, role_ids: Iterable):
+    """Revoke the tokens of every user holding one of the given roles (role claims changed)."""
+    await bump_token_epochs(await role_user_ids(session, role_ids))
+
+
+async def token_claims(user, token_type: str = "access", epoch: Optional[int] = None) -> dict:
+    """
+    Claims for a user's token: id, type and the current epoch, plus role and
+    status on access tokens so the middleware can authorise without a DB lookup.
+    Pass `epoch` when issuing several tokens at once to read it only once.
+    """
+    if epoch is None:
+        epoch = await get_token_epoch(user.id)
+    claims = {"id": str(user.id), "type": token_type, "epoch": epoch}
+    if token_type == "access":
+        claims.update({
+            "role": user.role.name if user.role else None,
+            "role_id": str(user.role_id) if user.role_id else None,
+            "status": user.status,
+        })
+    return claims
+
+
+def principal_from_claims(payload: dict) -> Principal:
+    """Build a claims-only principal (profile fields are left unset)."""
+    return Principal(
+        id=payload["id"],
+        status=payload["status"],
+        role_id=payload.get("role_id"),
+        role=PrincipalRole(name=payload["role"]) if payload.get("role") else None,
+    )
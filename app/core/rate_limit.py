@@ -0,0 +1,146 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app.utils.route_matcher import RouteTrie
+from app.core.redis import redis_cache
+from app.core.config import settings
+from redis.exceptions import RedisError
+from logs.logging import logger
+import math
+
+RATE_LIMIT_PREFIX = "ratelimit"
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+'''
+=====================================================
+# Atomic multi-bucket token bucket (Lua)
+# KEYS: bucket keys, ARGV: capacity and refill rate (tokens/ms) per key.
+# Either every bucket has a token and one is taken from each, or nothing
+# is consumed and the longest wait (ms) is returned.
+=====================================================
+'''
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local retry_after = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        retry_after = math.max(retry_after, math.ceil((1 - tokens) / rate))
+    end
+    levels[i] = tokens
+end
+if retry_after > 0 then
+    return retry_after
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+end
+return 0
+"""
+
+
+'''
+=====================================================
+# Rate definition ("<count>/<second|minute|hour|day>")
+=====================================================
+'''
+class Rate(NamedTuple):
+    capacity: int
+    period: int  # seconds
+
+    @property
+    def per_ms(self) -> float:
+        return self.capacity / (self.period * 1000)
+
+
+def parse_rate(value: str) -> Rate:
+    try:
+        count, unit = value.replace(" ", "").split("/")
+        return Rate(int(count), PERIODS[unit.lower().rstrip("s")])
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit '{value}', expected '<count>/<second|minute|hour|day>'")
+
+
+'''
+=====================================================
+# Rate limiter configured per role, route pattern and API key
+=====================================================
+'''
+class RateLimiter:
+    def __init__(
+        self,
+        roles: Dict[str, str],
+        routes: Dict[str, str],
+        api_key: Optional[str] = None,
+        client: Optional[str] = None,
+    ):
+        self.roles = {role: parse_rate(rate) for role, rate in roles.items()}
+        self.api_key = parse_rate(api_key) if api_key else None
+        self.client = parse_rate(client) if client else None
+
+        # Route rules are written as "METHOD /path/{param}" (or just "/path" for any method)
+        self.routes: List[Tuple[str, RouteTrie, Rate]] = []
+        for rule, rate in routes.items():
+            method, _, route = rule.strip().rpartition(" ")
+            methods = [method.upper()] if method else ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD"]
+            trie = RouteTrie()
+            trie.add(route, methods)
+            self.routes.append((rule, trie, parse_rate(rate)))
+
+    async def hit(self, identity: str, role: Optional[str], path: str, method: str,
+                  api_key_hash: Optional[str] = None) -> Optional[int]:
+        """
+        Take one token from every bucket that applies to the request.
+        Returns the number of seconds to wait when a bucket is exhausted, else None.
+        """
+        buckets: List[Tuple[str, Rate]] = []
+        for rule, trie, rate in self.routes:
+            if trie.match(path, method):
+                buckets.append((f"{RATE_LIMIT_PREFIX}:route:{rule}:{identity}", rate))
+        if role in self.roles:
+            buckets.append((f"{RATE_LIMIT_PREFIX}:role:{role}:{identity}", self.roles[role]))
+        if api_key_hash and self.api_key:
+            buckets.append((f"{RATE_LIMIT_PREFIX}:api_key:{api_key_hash}", self.api_key))
+        return await self._take(buckets)
+
+    async def hit_client(self, client_ip: str) -> Optional[int]:
+        """
+        Take one token from the client IP bucket, checked before authentication so
+        that invalid API keys and tokens are throttled before any database lookup.
+        """
+        if not self.client:
+            return None
+        return await self._take([(f"{RATE_LIMIT_PREFIX}:client:{client_ip}", self.client)])
+
+    async def _take(self, buckets: List[Tuple[str, Rate]]) -> Optional[int]:
+        if not buckets:
+            return None
+
+        args = []
+        for _, rate in buckets:
+            args.extend([rate.capacity, rate.per_ms])
+        try:
+            retry_after_ms = await redis_cache.run_script(
+                TOKEN_BUCKET_SCRIPT, keys=[key for key, _ in buckets], args=args)
+        except RedisError as e:
+            # Fail open: an unavailable Redis must not take the API down
+            logger.warning(f"Rate limiter unavailable: {e}")
+            return None
+
+        return math.ceil(int(retry_after_ms) / 1000) if retry_after_ms else None
+
+
+rate_limiter = RateLimiter(
+    roles=settings.rate_limit_roles,
+    routes=settings.rate_limit_routes,
+    api_key=settings.rate_limit_api_key,
+    client=settings.rate_limit_client,
+)
@@ -1,10 +1,88 @@
 import redis.asyncio as redis
 import json
 import asyncio  # ✅ Import asyncio for concurrent operations
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+import contextvars
+import time
+import uuid
+from redis.exceptions import RedisError
 from app.core.config import settings
+from app.core.timing import timed
+from app.core.cache_codec import CacheCodec, CacheDecodeError, CacheEntry, RawBody
+from app.utils.ttl_cache import TTLCache
+from logs.logging import logger
 
 # Redis Configuration
 REDIS_URL = settings.redis_url  # Example: "redis://localhost:6379"
+GENERATION_KEY_PREFIX = "cache_gen:"
+BATCH_SIZE = 500  # Keys per UNLINK when deleting by pattern
+L1_CHANNEL = "cache_l1_invalidations"  # Pub/Sub channel evicting L1 entries on every worker
+LOCK_KEY_PREFIX = "lock:"
+LOCK_TTL_MS = 10_000  # Upper bound on a cross-worker refresh
+LOCK_POLL_INTERVAL = 0.05  # Seconds between checks while another worker refreshes
+
+# Delete a lock only if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+'''
+=====================================================
+# ✅ Redis client recording command time per request
+=====================================================
+'''
+class TimedRedis(redis.Redis):
+    """Times single commands; `RedisCache.pipeline()` times whole pipelines."""
+
+    async def execute_command(self, *args, **options):
+        with timed("redis"):
+            return await super().execute_command(*args, **options)
+
+
+'''
+=====================================================
+# ✅ Buffered commands sent in one round trip
+=====================================================
+'''
+class CachePipeline:
+    """
+    Thin wrapper over a redis-py pipeline that encodes values like RedisCache.
+    Commands are buffered and sent when the `RedisCache.pipeline()` block exits;
+    their replies are then available in `results`.
+    """
+
+    def __init__(self, pipeline, codec: CacheCodec):
+        self._pipeline = pipeline
+        self._codec = codec
+        self.invalidated = []  # Keys to evict from every worker's L1
+        self.results = []
+
+    def set(self, key, value, ttl=600, raw: bool = False, compress_threshold: Optional[int] = None):
+        self._pipeline.setex(key, ttl, self._codec.encode(value, raw=raw, compress_threshold=compress_threshold))
+
+    def incr(self, key):
+        self._pipeline.incr(key)
+
+    def unlink(self, *keys):
+        if keys:
+            self._pipeline.unlink(*keys)
+            self.invalidated.extend(keys)
+
+    def zadd(self, key, mapping: dict):
+        self._pipeline.zadd(key, mapping)
+
+    def bump_generation(self, namespace):
+        key = f"{GENERATION_KEY_PREFIX}{namespace}"
+        self._pipeline.incr(key)
+        self.invalidated.append(key)
+
+    def publish(self, channel, message):
+        self._pipeline.publish(channel, json.dumps(message))
+
 
 '''
 =====================================================
@@ -14,37 +92,311 @@ REDIS_URL = settings.redis_url  # Example: "redis://localhost:6379"
 class RedisCache:
     def __init__(self):
         self.redis = None
+        self._scripts = {}
+        self.codec = CacheCodec(
+            codec=settings.redis_cache_codec,
+            compression=settings.redis_cache_compression,
+            compress_threshold=settings.redis_cache_compress_threshold,
+            write_format=settings.redis_cache_format,
+        )
+        # Optional per-process L1, bounded by entries and encoded bytes
+        self.l1 = TTLCache(
+            maxsize=settings.redis_l1_max_entries,
+            ttl=settings.redis_l1_ttl,
+            maxweight=settings.redis_l1_max_bytes,
+        ) if settings.redis_l1_enabled else None
+        self._l1_id = uuid.uuid4().hex
+        self._l1_epoch = 0  # Bumped on every eviction, guards fills racing an invalidation
+        self._inflight: Dict[str, asyncio.Future] = {}  # Single-flight loads per key
+        self._refreshing: Dict[str, asyncio.Task] = {}  # Background stale-while-revalidate refreshes
 
     async def connect(self):
-        """Establish Redis connection."""
-        self.redis = redis.from_url(REDIS_URL, decode_responses=True)
+        """Establish a binary-safe Redis connection (values are framed by the cache codec)."""
+        self.redis = TimedRedis.from_url(REDIS_URL, decode_responses=False)
+
+    async def get(self, key, l1: bool = False):
+        """
+        Retrieve value from Redis. With `l1` the value is served from, and kept
+        in, the in-process L1 (callers must not mutate the returned value).
+        """
+        entry = await self.get_entry(key, l1=l1)
+        return entry.value if entry else None
+
+    async def get_entry(self, key, l1: bool = False) -> Optional[CacheEntry]:
+        """Retrieve a value with its freshness deadline (see `get_or_set`)."""
+        use_l1 = l1 and self.l1 is not None
+        if use_l1:
+            entry = self.l1.get(key)
+            if entry is not None:
+                return entry
+            epoch = self._l1_epoch
 
-    async def get(self, key):
-        """Retrieve value from Redis."""
         data = await self.redis.get(key)
-        return json.loads(data) if data else None
+        try:
+            entry = self.codec.decode_entry(data)
+        except CacheDecodeError as e:
+            # Written by a worker with a codec we lack: treat as a miss
+            logger.warning(f"Unreadable cache entry '{key}': {e}")
+            return None
+
+        if use_l1 and entry is not None and epoch == self._l1_epoch:
+            self.l1.set(key, entry, weight=len(data))
+        return entry
 
-    async def set(self, key, value, ttl=600):
-        """Store value in Redis with expiration."""
-        await self.redis.setex(key, ttl, json.dumps(value))
+    async def get_or_set(self, key, loader: Callable[[], Awaitable[Any]], ttl=600,
+                         stale_ttl: int = 0, l1: bool = False, raw: bool = False,
+                         compress_threshold: Optional[int] = None):
+        """
+        Cache-aside read with request coalescing.
+
+        Concurrent misses in this worker share a single `loader()` call and a
+        short Redis lock lets only one worker load while the others wait for its
+        result. With `stale_ttl` the entry outlives `ttl` by that long and stale
+        values are served immediately while one background task refreshes them;
+        the loader then runs outside the request context, so it must open its
+        own DB session (`get_read_session()` does that automatically).
+        With `raw` the loader returns bytes and a `RawBody` is returned.
+        """
+        options = {"ttl": ttl, "stale_ttl": stale_ttl, "l1": l1, "raw": raw,
+                   "compress_threshold": compress_threshold}
+        entry = await self.get_entry(key, l1=l1)
+        if entry is not None and entry.fresh_until is not None:
+            if entry.fresh_until <= time.time():
+                self._refresh_in_background(key, loader, options)
+            return entry.value
+
+        while key in self._inflight:
+            future = self._inflight[key]
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # We were cancelled, not the shared load
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())  # Never "unretrieved"
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader, wait=True, **options)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, loader, options: dict):
+        if key in self._refreshing:
+            return
+        # A fresh context keeps the refresh off the request's DB session and timings
+        task = asyncio.create_task(self._load(key, loader, wait=False, **options),
+                                   context=contextvars.Context())
+        self._refreshing[key] = task
+
+        def _done(task: asyncio.Task):
+            self._refreshing.pop(key, None)
+            if not task.cancelled() and task.exception():
+                logger.error(f"Background refresh of '{key}' failed: {task.exception()}")
+        task.add_done_callback(_done)
+
+    async def _load(self, key, loader, wait: bool, ttl, stale_ttl, l1, raw, compress_threshold):
+        """Run the loader under a cross-worker lock and store its result."""
+        lock_key = f"{LOCK_KEY_PREFIX}{key}"
+        token = uuid.uuid4().hex
+        acquired = await self.redis.set(lock_key, token, nx=True, px=LOCK_TTL_MS)
+        if not acquired:
+            if not wait:
+                return None  # Another worker is already refreshing it
+            # Wait for the worker holding the lock, loading ourselves if it takes too long
+            deadline = time.monotonic() + LOCK_TTL_MS / 1000
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                # The holder stores the value before releasing, so check the lock first
+                lock_held = await self.redis.exists(lock_key)
+                entry = await self.get_entry(key)
+                if entry is not None and (entry.fresh_until or 0) > time.time():
+                    return entry.value
+                if not lock_held:
+                    break
+
+        try:
+            value = await loader()
+            await self.set(key, value, ttl=ttl + stale_ttl, l1=l1, fresh_until=time.time() + ttl,
+                           raw=raw, compress_threshold=compress_threshold)
+            return RawBody(value) if raw else value
+        finally:
+            if acquired:
+                await self.run_script(RELEASE_LOCK_SCRIPT, keys=[lock_key], args=[token])
+
+    async def get_many(self, keys: List[str]) -> list:
+        """Retrieve several values with one MGET, `None` for missing keys."""
+        if not keys:
+            return []
+        values = []
+        for key, data in zip(keys, await self.redis.mget(keys)):
+            try:
+                values.append(self.codec.decode(data))
+            except CacheDecodeError as e:
+                logger.warning(f"Unreadable cache entry '{key}': {e}")
+                values.append(None)
+        return values
+
+    async def incr(self, key):
+        """Atomically increment an integer counter and return the new value."""
+        return await self.redis.incr(key)
+
+    async def get_generation(self, namespace):
+        """Return the current generation counter of a cache namespace (L1 cached)."""
+        return int(await self.get(f"{GENERATION_KEY_PREFIX}{namespace}", l1=True) or 0)
+
+    async def bump_generation(self, namespace):
+        """
+        Invalidate every key built from a namespace generation with a single INCR.
+        Keys of older generations are never read again and simply expire.
+        """
+        key = f"{GENERATION_KEY_PREFIX}{namespace}"
+        generation = await self.redis.incr(key)
+        await self.invalidate_l1([key])
+        return generation
+
+    async def set(self, key, value, ttl=600, l1: bool = False, fresh_until: Optional[float] = None,
+                  raw: bool = False, compress_threshold: Optional[int] = None):
+        """
+        Store value in Redis with expiration. `l1` also keeps it in this worker's
+        L1 as a cache-aside fill; it is not broadcast, so values that replace
+        newer data must be invalidated with `delete`/`unlink_many` instead.
+        `raw` stores bytes as-is, `fresh_until` is used by `get_or_set`.
+        """
+        data = self.codec.encode(value, fresh_until=fresh_until, raw=raw, compress_threshold=compress_threshold)
+        await self.redis.setex(key, ttl, data)
+        if l1 and self.l1 is not None:
+            entry = self.codec.decode_entry(data) if raw else CacheEntry(value, fresh_until)
+            self.l1.set(key, entry, ttl=min(ttl, self.l1.ttl), weight=len(data))
+
+    async def set_many(self, mapping: dict, ttl: Union[int, Dict[str, int]] = 600, raw: bool = False,
+                       compress_threshold: Optional[int] = None):
+        """Store several values in one round trip, `ttl` may map each key to its own TTL."""
+        if not mapping:
+            return
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ttl=ttl[key] if isinstance(ttl, dict) else ttl, raw=raw,
+                         compress_threshold=compress_threshold)
+
+    async def exists(self, key):
+        """Check whether a key exists in Redis."""
+        return await self.redis.exists(key) > 0
+
+    async def zadd(self, key, mapping: dict):
+        """Add members with scores to a sorted set."""
+        await self.redis.zadd(key, mapping)
+
+    async def zrangebyscore(self, key, min_score, max_score):
+        """Return sorted set members with a score in the given range."""
+        return [member.decode() for member in await self.redis.zrangebyscore(key, min_score, max_score)]
+
+    async def zremrangebyscore(self, key, min_score, max_score):
+        """Remove sorted set members with a score in the given range."""
+        return await self.redis.zremrangebyscore(key, min_score, max_score)
 
     async def delete(self, key):
         """Delete a single key from Redis."""
         await self.redis.delete(key)
+        await self.invalidate_l1([key])
 
-    async def delete_many(self, keys: list):
-        """Delete multiple keys by pattern concurrently."""
+    async def unlink_many(self, keys: Iterable[str]):
+        """Delete exact keys with a single UNLINK (memory is reclaimed in the background)."""
+        keys = list(keys)
         if keys:
-            tasks = []
-            for pattern in keys:
-                async for key in self.redis.scan_iter(pattern):
-                    tasks.append(self.redis.delete(key))
-                await asyncio.gather(*tasks)
+            await self.redis.unlink(*keys)
+            await self.invalidate_l1(keys)
+
+    async def delete_many(self, patterns: list):
+        """Delete every key matching any of the patterns using SCAN, unlinking in batches."""
+        batch = []
+        for pattern in patterns:
+            async for key in self.redis.scan_iter(pattern):
+                batch.append(key.decode())
+                if len(batch) >= BATCH_SIZE:
+                    await self.unlink_many(batch)
+                    batch = []
+        await self.unlink_many(batch)
 
     async def delete_pattern(self, pattern):
-        """Delete all keys matching a pattern using SCAN."""
-        async for key in self.redis.scan_iter(pattern):
-            await self.redis.delete(key)
+        """Delete all keys matching a pattern using SCAN (maintenance only, cost grows with the keyspace)."""
+        await self.delete_many([pattern])
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False):
+        """
+        Buffer commands and send them in one round trip when the block exits,
+        wrapped in MULTI/EXEC when `transaction` is set.
+        """
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            cache_pipeline = CachePipeline(pipe, self.codec)
+            yield cache_pipeline
+            if cache_pipeline.invalidated and self.l1 is not None:
+                self._evict_l1(cache_pipeline.invalidated)
+                cache_pipeline.publish(L1_CHANNEL, {"origin": self._l1_id, "keys": cache_pipeline.invalidated})
+            # Pipelines bypass execute_command, so their round trip is timed here
+            with timed("redis"):
+                cache_pipeline.results = await pipe.execute()
+
+    def _evict_l1(self, keys: Iterable[str]):
+        self._l1_epoch += 1
+        for key in keys:
+            self.l1.delete(key)
+
+    async def invalidate_l1(self, keys: List[str]):
+        """Evict keys from this worker's L1 and tell the other workers to do the same."""
+        if self.l1 is None or not keys:
+            return
+        self._evict_l1(keys)
+        await self.publish(L1_CHANNEL, {"origin": self._l1_id, "keys": keys})
+
+    async def watch_l1(self):
+        """Apply L1 evictions published by other workers."""
+        if self.l1 is None:
+            return
+        async for message in self.subscribe(L1_CHANNEL):
+            if message is None:
+                # Evictions may have been missed while we were not subscribed
+                self._l1_epoch += 1
+                self.l1.clear()
+            elif message.get("origin") != self._l1_id:
+                self._evict_l1(message.get("keys", []))
+
+    async def run_script(self, script: str, keys: list, args: list):
+        """Run a Lua script (EVALSHA, falling back to EVAL on first use)."""
+        if script not in self._scripts:
+            self._scripts[script] = self.redis.register_script(script)
+        return await self._scripts[script](keys=keys, args=args)
+
+    async def publish(self, channel, message):
+        """Publish a JSON message on a Pub/Sub channel."""
+        await self.redis.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel):
+        """
+        Yield JSON messages published on a channel, resubscribing after connection errors.
+        `None` is yielded after every (re)subscribe so callers can resynchronise
+        anything they may have missed while disconnected.
+        """
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(channel)
+                yield None
+                async for message in pubsub.listen():
+                    yield json.loads(message["data"])
+            except RedisError as e:
+                logger.warning(f"Redis subscription to '{channel}' lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
 
     async def close(self):
         """Close Redis connection."""
@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from typing import Dict, Optional
+import time
+
+
+'''
+=====================================================
+# Per-request phase timings (exposed as Server-Timing)
+=====================================================
+'''
+class RequestTimings:
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, duration_ms: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration_ms
+
+    def server_timing(self) -> str:
+        """Render the phases as a `Server-Timing` header value."""
+        return ", ".join(f"{phase};dur={duration:.2f}" for phase, duration in self.phases.items())
+
+    def log_fields(self) -> Dict[str, float]:
+        return {f"{phase}_ms": round(duration, 2) for phase, duration in self.phases.items()}
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def request_timings():
+    """Collect phase timings for everything awaited inside this block."""
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def record(phase: str, duration_ms: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(phase, duration_ms)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the wall time of the block to `phase` of the current request, if any."""
+    if _request_timings.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, (time.perf_counter() - start) * 1000)
+
+
+'''
+=====================================================
+# Record DB time through SQLAlchemy execute events
+=====================================================
+'''
+def instrument_engine(engine: AsyncEngine):
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        record("db", (time.perf_counter() - start) * 1000)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
@@ -1,31 +1,86 @@
 from fastapi import APIRouter, HTTPException, Query, Depends, Path, Request, status
-from app.api.schemas.base_schema import Page
+from app.api.schemas.base_schema import CursorPage, Page
 from app.core.database.db import get_read_session, get_write_session
-from app.generator.utils.generate_file import csv_file_response
-from app.generator.utils.pagination import paginate_query
+from app.generator.utils.generate_file import stream_file_response
+from app.generator.utils.pagination import COUNT_EXACT, paginate_cursor, paginate_query
+from app.generator.utils.cached_response import raw_json_response
 from app.generator.schema.registry import get_schemas
+from app.generator.schema.fieldsets import project_query, resolve_fieldset, serialize_row
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from app.core.database.base_model import Base
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from app.core.redis import redis_cache
-from typing import Optional, List
+from app.core.cache_codec import RawBody
+from app.core.cache_policy import get_cache_policy
+from app.core.database.cache_invalidation import data_namespace, detail_key, item_key, list_namespace
+from app.utils.filtering import query_fingerprint
+from typing import Literal, Optional, List, Union
 from uuid import UUID
-import pandas as pd
 import hashlib
-
+import json
 
 
 def create_crud_routes(model: Base) -> APIRouter:
 
     SchemaCreate, SchemaUpdate, SchemaAllResponse, SchemaIdResponse = get_schemas(model)
     router = APIRouter(tags=[model.__name__.capitalize()])
+    # TTLs and cached endpoints come from the model's `__cache__` declaration
+    policy = get_cache_policy(model)
+
+    # Cache keys embed a generation: id lists the list generation (membership changes),
+    # projected pages the data generation (any write). Both are bumped after commit
+    # by the session hooks in cache_invalidation.
+    async def cache_prefix(namespace: str) -> str:
+        generation = await redis_cache.get_generation(namespace)
+        return f"{namespace}_v{generation}"
+
+    '''
+    =====================================================
+    # Normalised entity cache: lists hold ids, rows are cached once per schema
+    =====================================================
+    '''
+    def row_key(id) -> str:
+        # List items share the detail entry unless the list schema differs
+        if SchemaAllResponse is SchemaIdResponse:
+            return detail_key(model, id)
+        return item_key(model, id)
+
+    def serialize_item(record) -> bytes:
+        item = jsonable_encoder(record, exclude_unset=True, exclude_none=True)
+        return SchemaAllResponse.model_validate(item).model_dump_json(by_alias=True).encode()
+
+    async def cache_items(records) -> dict:
+        bodies = {str(record.id): serialize_item(record) for record in records}
+        await redis_cache.set_many(
+            {row_key(id): body for id, body in bodies.items()}, ttl=policy.detail_ttl, raw=True,
+            compress_threshold=policy.compress_threshold)
+        return bodies
+
+    async def get_item_bodies(ids: List[str]) -> List[bytes]:
+        """Item bodies in order: one MGET, then one query for the ids not cached."""
+        cached = await redis_cache.get_many([row_key(id) for id in ids])
+        bodies = {id: body.decompressed() for id, body in zip(ids, cached) if isinstance(body, RawBody)}
+        missing = [UUID(id) for id in ids if id not in bodies]
+        if missing:
+            async for session in get_read_session():
+                records = await model.get_records_by_ids(session, missing)
+            bodies.update(await cache_items(records))
+        # Rows deleted since the list was cached are skipped
+        return [bodies[id] for id in ids if id in bodies]
+
+    async def total_cache_key(filters: Optional[str], search: Optional[str]) -> str:
+        # Exact totals are shared by every page and sort of the same filters
+        fingerprint = query_fingerprint(model, filters, None, search)
+        return f"{await cache_prefix(list_namespace(model))}_{fingerprint}_count"
+
     '''
     =====================================================
-    # Routes for Download Data as CSV
+    # Routes for Download Data as CSV / NDJSON
     =====================================================
     '''
-    @router.get("/download", response_class=FileResponse, name=model.__name__.capitalize())
+    @router.get("/download", response_class=StreamingResponse, name=model.__name__.capitalize())
     async def download_all(
         request: Request,
         filters: Optional[str] = Query(
@@ -34,45 +89,43 @@ def create_crud_routes(model: Base) -> APIRouter:
             None, description="A string representing sort field and direction in the format 'field:direction'."),
         search: Optional[str] = Query(
             None, description="A string for global search across string fields."),
-        session: AsyncSession = Depends(get_read_session),
-        file_format: str = Query(
-            "csv", description="The format of the downloaded file (csv or excel)."),
+        file_format: Literal["csv", "ndjson"] = Query(
+            "csv", description="The format of the downloaded file (csv or ndjson)."),
+        fields: Optional[str] = Query(
+            None, description="Comma separated fields to return, dotted for relationship fields (e.g. 'id,name,role.name')."),
     ):
         """
-        download all records with optional filtering, sorting, and searching to a file (CSV or Excel).
+        download all records with optional filtering, sorting, and searching, streamed as a CSV or NDJSON file.
         """
-        cache_key = f"{model.__name__.lower()}_list_{hashlib.md5(str(filters).encode()).hexdigest()}_{sort}_{search}_{file_format}_download"
+        fieldset = resolve_fieldset(model, SchemaAllResponse, fields)
+        query = await model.get_records(filters, sort, search)
 
-        # Check if download data is cached in Redis
-        cached_data = await redis_cache.get(cache_key)
-        if cached_data:
-            return csv_file_response(cached_data, model.__name__.lower())
+        if fieldset:
+            # Only the requested columns, in the requested order (dotted names for relationship fields)
+            headers = list(fieldset.paths)
+            query = project_query(model, query, fieldset, with_id=False)
+        else:
+            # Reorder columns based on model definition, exporting only what the list schema
+            # exposes (never e.g. password hashes or 2FA secrets)
+            model_columns = [column.name for column in model.__table__.columns
+                             if column.name in SchemaAllResponse.model_fields]
+            first_columns = ['id']
+            last_columns = ['created_at', 'updated_at',
+                            'deleted_at', 'created_by', 'updated_by', 'deleted_by']
+            middle_columns = [
+                col for col in model_columns if col not in first_columns + last_columns]
+            headers = [col for col in first_columns + middle_columns + last_columns if col in model_columns]
+            query = query.with_only_columns(*(model.__table__.c[name] for name in headers))
 
-        query = await model.get_records(filters, sort, search)
-        results = await session.execute(query)
-        result = results.scalars().all()
-        # Convert records to DataFrame
-        df = pd.DataFrame(jsonable_encoder(result))
-        # Reorder columns based on model definition
-        model_columns = [column.name for column in model.__table__.columns]
-        first_columns = ['id']
-        last_columns = ['created_at', 'updated_at',
-                        'deleted_at', 'created_by', 'updated_by', 'deleted_by']
-        middle_columns = [
-            col for col in model_columns if col not in first_columns + last_columns]
-        ordered_columns = first_columns + middle_columns + last_columns
-        df = df[ordered_columns]
-
-        data_dict = jsonable_encoder(df.to_dict(orient="records"))
-        await redis_cache.set(cache_key, data_dict, ttl=300)
-        return csv_file_response(data_dict, model.__name__.lower())
+        # Rows are streamed from a server-side cursor, never held in full or cached
+        return stream_file_response(request, query, headers, model.__name__.lower(), file_format)
 
     '''
     =====================================================
     # Routes for retrieving data from the database
     =====================================================
     '''
-    @router.get("", response_model=Page[SchemaAllResponse], name=model.__name__.capitalize())
+    @router.get("", response_model=Union[Page[SchemaAllResponse], CursorPage[SchemaAllResponse]], name=model.__name__.capitalize())
     async def read_all(
         request: Request,
         filters: Optional[str] = Query(
@@ -88,24 +141,91 @@ def create_crud_routes(model: Base) -> APIRouter:
             None, description="A string for global search across string fields."),
         page: int = Query(1, description="Page number"),
         size: int = Query(50, description="Number of items per page"),
-        session: AsyncSession = Depends(get_read_session),
+        pagination: Literal["offset", "cursor"] = Query(
+            "offset", description="'offset' for numbered pages, 'cursor' to seek on (sort field, id) for deep pages."),
+        cursor: Optional[str] = Query(
+            None, description="A next_cursor or prev_cursor from a previous cursor page (implies cursor pagination)."),
+        count: Literal["exact", "estimate", "none"] = Query(
+            "exact", description="How total is computed: exact COUNT, planner estimate, or none (offset pagination only)."),
+        fields: Optional[str] = Query(
+            None, description="Comma separated fields to return, dotted for relationship fields (e.g. 'id,name,role.name')."),
     ):
         """
         Retrieve paginated records with optional filtering, sorting, and searching.
         """
+        cursor_mode = pagination == "cursor" or cursor is not None
+        fieldset = resolve_fieldset(model, SchemaAllResponse, fields)
+        projected = fieldset is not None
 
-        cache_key = f"{model.__name__.lower()}_list_{hashlib.md5(str(filters).encode()).hexdigest()}_{sort}_{search}_page_{page}_size_{size}"
-        cached_data = await redis_cache.get(cache_key)
-        if cached_data:
-            return cached_data  # Return cached paginated response
+        async def query_page() -> dict:
+            if cursor_mode:
+                query, column, descending = await model.get_sorted_records(filters, sort, search)
+                if projected:
+                    query = project_query(model, query, fieldset)
+                async for session in get_read_session():
+                    response_data = await paginate_cursor(
+                        session, query, model, column, descending, sort, cursor, size, projected)
+                return response_data
 
-        query = await model.get_records(filters, sort, search)
-        response_data = await paginate_query(session, query, page, size)
-        response_dict = jsonable_encoder(
-            response_data, exclude_unset=True, exclude_none=True)
+            query = await model.get_records(filters, sort, search)
+            if projected:
+                query = project_query(model, query, fieldset)
+            total = total_key = None
+            if count == COUNT_EXACT and policy.read_all:
+                total_key = await total_cache_key(filters, search)
+                total = await redis_cache.get(total_key)
+            # Unfiltered estimates read pg_class.reltuples instead of planning the query
+            table = None if filters or search else model.__tablename__
+            async for session in get_read_session():
+                # Without a cached total the exact count comes back with the page rows
+                response_data = await paginate_query(session, query, page, size, count, total, table, projected)
+            if total_key and total is None:
+                await redis_cache.set(total_key, response_data["total"], ttl=policy.list_ttl)
+            return response_data
+
+        def page_body(listing: dict, items: List[bytes]) -> bytes:
+            # Items are already serialized with the response schema, only the envelope is added
+            meta = {field: value for field, value in listing.items() if field != "items"}
+            return b'{"items":[' + b",".join(items) + b"]," + json.dumps(meta, separators=(",", ":")).encode()[1:]
+
+        async def load_projected_body() -> bytes:
+            listing = await query_page()
+            return page_body(listing, [serialize_row(fieldset, row) for row in listing["items"]])
+
+        cacheable = policy.read_all and size <= policy.max_page_size
+        if not cacheable:
+            if projected:
+                return raw_json_response(request, RawBody(await load_projected_body()))
+            listing = await query_page()
+            return raw_json_response(request, RawBody(page_body(listing, [serialize_item(record) for record in listing["items"]])))
+
+        fingerprint = query_fingerprint(model, filters, sort, search)
+        if cursor_mode:
+            position = f"cursor_{hashlib.sha256((cursor or '').encode()).hexdigest()[:32]}"
+        else:
+            position = f"page_{page}_count_{count}"
+        cache_key = f"{fingerprint}_{position}_size_{size}"
+        first_page = cursor is None if cursor_mode else page == 1
+
+        if projected:
+            # Projected rows are small and not shared with other entries, the whole body is cached
+            body = await redis_cache.get_or_set(
+                f"{await cache_prefix(data_namespace(model))}_{cache_key}_fields_{fieldset.key}",
+                load_projected_body, ttl=policy.list_ttl,
+                stale_ttl=policy.stale_ttl, l1=first_page, raw=True, compress_threshold=policy.compress_threshold)
+            return raw_json_response(request, body)
 
-        await redis_cache.set(cache_key, response_dict, ttl=300)
-        return response_dict
+        async def load_page() -> dict:
+            response_data = await query_page()
+            await cache_items(response_data["items"])
+            return {**response_data, "items": [str(record.id) for record in response_data["items"]]}
+
+        # The list entry only holds ids and page metadata. Concurrent misses share one query,
+        # expired entries are served while refreshed, first pages also live in the L1
+        listing = await redis_cache.get_or_set(
+            f"{await cache_prefix(list_namespace(model))}_{cache_key}_ids", load_page, ttl=policy.list_ttl, stale_ttl=policy.stale_ttl, l1=first_page,
+            compress_threshold=policy.compress_threshold)
+        return raw_json_response(request, RawBody(page_body(listing, await get_item_bodies(listing["items"]))))
 
     '''
     =====================================================
@@ -116,15 +236,32 @@ def create_crud_routes(model: Base) -> APIRouter:
     async def read_one(
         request: Request,
         id: str = Path(..., description="The ID of the record to retrieve."),
+        fields: Optional[str] = Query(
+            None, description="Comma separated fields to return, dotted for relationship fields (e.g. 'id,name,role.name')."),
         session: AsyncSession = Depends(get_read_session),
     ):
         """
         Retrieve a single record by its ID.
         """
-        cache_key = f"{model.__name__.lower()}_detail_{id}"
-        cached_data = await redis_cache.get(cache_key)
-        if cached_data:
-            return cached_data  # Return cached response
+        fieldset = resolve_fieldset(model, SchemaIdResponse, fields)
+        cache_key = detail_key(model, id)
+        if policy.read_one:
+            cached_body = await redis_cache.get(cache_key, l1=True)
+            if isinstance(cached_body, RawBody) and fieldset:
+                # The full cached record already holds every requested field
+                body = serialize_row(fieldset, json.loads(cached_body.decompressed()))
+                return raw_json_response(request, RawBody(body))
+            if isinstance(cached_body, RawBody):
+                return raw_json_response(request, cached_body)  # Cached serialized body, sent as-is
+
+        if fieldset:
+            # Only the requested columns are read; the full detail entry is filled by full reads
+            query = project_query(model, select(model).where(model.deleted_at.is_(None), model.id == id), fieldset)
+            row = (await session.execute(query)).first()
+            if row is None:
+                raise HTTPException(
+                    status_code=404, detail=f"{model.__name__} with ID {id} not found")
+            return raw_json_response(request, RawBody(serialize_row(fieldset, row._mapping)))
 
         data = await model.get_record_by_id(session, id)
         if not data:
@@ -132,8 +269,11 @@ def create_crud_routes(model: Base) -> APIRouter:
                 status_code=404, detail=f"{model.__name__} with ID {id} not found")
         result_dict = jsonable_encoder(
             data, exclude_unset=True, exclude_none=True)
-        await redis_cache.set(cache_key, result_dict, ttl=300)
-        return result_dict
+        body = SchemaIdResponse.model_validate(result_dict).model_dump_json(by_alias=True).encode()
+        if policy.read_one:
+            await redis_cache.set(cache_key, body, ttl=policy.detail_ttl, l1=True, raw=True,
+                                  compress_threshold=policy.compress_threshold)
+        return raw_json_response(request, RawBody(body))
 
     '''
     =====================================================
@@ -150,9 +290,6 @@ def create_crud_routes(model: Base) -> APIRouter:
         Create multiple new records in bulk and invalidate cached list.
         """
         count = await model.create(session, items)
-
-        # ✅ Batch cache deletion
-        await redis_cache.delete_pattern(f"{model.__name__.lower()}_list_*")
         return {
             "detail": "Data created successfully",
             "count": count,
@@ -177,19 +314,12 @@ def create_crud_routes(model: Base) -> APIRouter:
                 status_code=400, detail="No data provided for update"
             )
 
-        ids = [item.id for item in items]
-
         count = await model.update(session, items)
         if count == 0:
             raise HTTPException(
                 status_code=404, detail="No matching records found for update"
             )
 
-        # Batch Redis cache deletion for updated items
-        cache_keys = [f"{model.__name__.lower()}_detail_{id}_*" for id in ids]
-        await redis_cache.delete_many(cache_keys)
-        await redis_cache.delete_pattern(f"{model.__name__.lower()}_list_*")
-
         return {"detail": "Data updated successfully", "count": count}
 
     '''
@@ -232,10 +362,6 @@ def create_crud_routes(model: Base) -> APIRouter:
             raise HTTPException(
                 status_code=404, detail="No matching records found")
 
-        cache_keys = [f"{model.__name__.lower()}_detail_{id}_*" for id in ids]
-        await redis_cache.delete_many(cache_keys)
-        await redis_cache.delete_pattern(f"{model.__name__.lower()}_list_*")
-
         return {"detail": "Data deleted successfully", "count": result}
 
     return router
\ No newline at end of file
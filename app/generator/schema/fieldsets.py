@@ -0,0 +1,143 @@
+from pydantic import BaseModel, create_model
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty
+from sqlalchemy.sql import Select
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from app.utils.filtering import resolve_and_join_column
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type, get_args
+import hashlib
+
+
+class Fieldset(NamedTuple):
+    schema: Type[BaseModel]  # Response schema restricted to the requested fields
+    paths: Tuple[str, ...]  # Model attribute paths to select, dotted through relationships
+    key: str  # Short digest of the field set, for cache keys
+
+
+'''
+=====================================================
+# Resolve `fields=` against a response schema and model
+=====================================================
+'''
+def resolve_fieldset(model, schema: Type[BaseModel], fields: Optional[str]) -> Optional[Fieldset]:
+    """
+    Parse `fields=id,name,role.name` (None when absent). A relationship named
+    without sub-fields selects every column field of its sub-schema.
+    """
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    if not requested:
+        return None
+    return _fieldset(model, schema, requested)
+
+
+@lru_cache(maxsize=512)
+def _fieldset(model, schema: Type[BaseModel], requested: Tuple[str, ...]) -> Fieldset:
+    tree: Dict[str, Any] = {}
+    for field in requested:
+        node = tree
+        *parents, leaf = field.split(".")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+            if not isinstance(node, dict):
+                raise HTTPException(status_code=400, detail=f"Field '{field}' overlaps another field")
+        if isinstance(node.get(leaf), dict):
+            raise HTTPException(status_code=400, detail=f"Field '{field}' overlaps another field")
+        node[leaf] = None
+
+    derived, paths = _derive(model, schema, tree, "")
+    key = hashlib.sha256(",".join(requested).encode()).hexdigest()[:16]
+    return Fieldset(derived, tuple(paths), key)
+
+
+def _schema_field(schema: Type[BaseModel], name: str):
+    for field_name, field in schema.model_fields.items():
+        if name in (field_name, field.alias):
+            return field_name, field
+    return None, None
+
+
+def _sub_schema(annotation) -> Optional[Type[BaseModel]]:
+    for candidate in (annotation, *get_args(annotation)):
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+
+def _derive(model, schema: Type[BaseModel], tree: Dict[str, Any], prefix: str) -> Tuple[Type[BaseModel], List[str]]:
+    definitions = {}
+    paths = []
+    for name, subtree in tree.items():
+        field_name, field = _schema_field(schema, name)
+        prop = getattr(getattr(model, field_name, None), "property", None) if field_name else None
+
+        if isinstance(prop, ColumnProperty) and subtree is None:
+            definitions[field_name] = (field.annotation, field)
+            paths.append(f"{prefix}{field_name}")
+        elif isinstance(prop, RelationshipProperty) and not prop.uselist and _sub_schema(field.annotation):
+            sub_schema = _sub_schema(field.annotation)
+            related = prop.mapper.class_
+            if subtree is None:
+                subtree = {
+                    sub_name: None for sub_name in sub_schema.model_fields
+                    if isinstance(getattr(getattr(related, sub_name, None), "property", None), ColumnProperty)
+                }
+            derived, sub_paths = _derive(related, sub_schema, subtree, f"{prefix}{field_name}.")
+            definitions[field_name] = (Optional[derived], None)
+            paths.extend(sub_paths)
+        else:
+            raise HTTPException(status_code=400, detail=f"Invalid field: {prefix}{name}")
+
+    derived = create_model(f"{schema.__name__}Fields", __config__=schema.model_config, **definitions)
+    return derived, paths
+
+
+'''
+=====================================================
+# Column projection and row shaping
+=====================================================
+'''
+def project_query(model, query: Select, fieldset: Fieldset, with_id: bool = True) -> Select:
+    """
+    Select only the fieldset's columns (labelled by path), joining relationships
+    as needed. `with_id` adds `id` when not requested (pagination needs it).
+    """
+    joins = {}
+    columns = [model.id.label("id")] if with_id and "id" not in fieldset.paths else []
+    for path in fieldset.paths:
+        nested_keys = path.split(".")
+        if len(nested_keys) == 1:
+            column = getattr(model, path)
+        else:
+            column, query = resolve_and_join_column(model, nested_keys, query, joins)
+        columns.append(column.label(path))
+    return query.with_only_columns(*columns)
+
+
+def nest_row(row) -> dict:
+    """Turn a projected row (`role.name` labels) into nested dicts, missing relations become None."""
+    item: Dict[str, Any] = {}
+    for label, value in row.items():
+        if label.startswith("_"):
+            continue  # Pagination helpers such as _total / _cursor_sort
+        node = item
+        *parents, leaf = label.split(".")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return _prune(item)
+
+
+def _prune(node: dict) -> dict:
+    for key, value in node.items():
+        if isinstance(value, dict):
+            value = _prune(value)
+            node[key] = value if any(v is not None for v in value.values()) else None
+    return node
+
+
+def serialize_row(fieldset: Fieldset, row) -> bytes:
+    item = jsonable_encoder(nest_row(row) if not isinstance(row, dict) else row)
+    return fieldset.schema.model_validate(item).model_dump_json(by_alias=True).encode()
@@ -0,0 +1,36 @@
+from fastapi import Request
+from fastapi.responses import Response
+from app.core.cache_codec import RawBody
+
+'''
+=====================================================
+# Check whether the client accepts a content encoding
+=====================================================
+'''
+def accepts_encoding(request: Request, encoding: str) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() not in (encoding, "*"):
+            continue
+        quality = params.strip().removeprefix("q=")
+        try:
+            return not params.strip() or float(quality) > 0
+        except ValueError:
+            return True
+    return False
+
+
+'''
+=====================================================
+# Send a cached, already serialized JSON body as-is
+=====================================================
+'''
+def raw_json_response(request: Request, body: RawBody, status_code: int = 200) -> Response:
+    headers = {"Vary": "Accept-Encoding"}
+    if body.encoding and accepts_encoding(request, body.encoding):
+        # Stored compressed: hand the bytes over without touching them
+        headers["Content-Encoding"] = body.encoding
+        content = body.data
+    else:
+        content = body.decompressed()
+    return Response(content=content, status_code=status_code, media_type="application/json", headers=headers)
@@ -1,20 +1,71 @@
-from tempfile import NamedTemporaryFile
-from fastapi.responses import FileResponse
-import pandas as pd
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+from app.core.database.db import get_read_session
+from app.generator.utils.cached_response import accepts_encoding
+from typing import AsyncIterator, List, Sequence
+import csv
+import io
+import json
+import zlib
+
+STREAM_BATCH_SIZE = 2000  # Rows fetched per round trip from the server-side cursor
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
 
 # =====================================================
-# Function to generate a CSV file from the provided data
-# and return it as a downloadable file response.
+# Encode one batch of rows as CSV or NDJSON text
 # =====================================================
-def csv_file_response(data, filename: str):
-    df = pd.DataFrame(data)
+def _csv_chunk(rows: List[list]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(["" if value is None else value for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(headers: Sequence[str], rows: List[list]) -> str:
+    return "".join(json.dumps(dict(zip(headers, row)), separators=(",", ":")) + "\n" for row in rows)
+
 
-    with NamedTemporaryFile(delete=False, suffix=".csv", mode="w", newline="") as tmp_file:
-        df.to_csv(tmp_file.name, index=False, encoding="utf-8")
+async def _stream_rows(query: Select, headers: Sequence[str], file_format: str) -> AsyncIterator[bytes]:
+    if file_format == "csv":
+        yield _csv_chunk([list(headers)]).encode()
+    async for session in get_read_session():
+        # Server-side cursor: only one batch of rows is held in memory at a time
+        result = await session.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for partition in result.partitions():
+            rows = jsonable_encoder([list(row) for row in partition])
+            chunk = _csv_chunk(rows) if file_format == "csv" else _ndjson_chunk(headers, rows)
+            yield chunk.encode()
 
-    headers = {
-        "Content-Disposition": f"attachment; filename={filename}.csv",
-        "Content-Type": "text/csv"
+
+async def _gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+# =====================================================
+# Stream the rows of a column query as a downloadable
+# CSV or NDJSON file, gzip encoded when the client accepts it.
+# =====================================================
+def stream_file_response(request: Request, query: Select, headers: Sequence[str],
+                         filename: str, file_format: str = "csv") -> StreamingResponse:
+    content = _stream_rows(query, headers, file_format)
+    response_headers = {
+        "Content-Disposition": f"attachment; filename={filename}.{file_format}",
+        "Vary": "Accept-Encoding",
     }
+    if accepts_encoding(request, "gzip"):
+        content = _gzip_stream(content)
+        response_headers["Content-Encoding"] = "gzip"
 
-    return FileResponse(tmp_file.name, headers=headers, filename=f"{filename}.csv")
+    return StreamingResponse(content, media_type=MEDIA_TYPES[file_format], headers=response_headers)
@@ -1,28 +1,207 @@
 from sqlalchemy.future import select
 from sqlalchemy.sql import func
+from sqlalchemy import and_, asc, desc, or_, text
+from sqlalchemy.dialects import postgresql
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Optional, Tuple
+import base64
+import binascii
+import json
+import operator
+import uuid
 
 '''
 =====================================================
-# Paginate Query
+# Count strategies (exact COUNT, planner estimate, none)
 =====================================================
 '''
-async def paginate_query(session, query, page, size):
+COUNT_EXACT = "exact"
+COUNT_ESTIMATE = "estimate"
+COUNT_NONE = "none"
+
+# Compiles queries with `:name` parameters so they can be wrapped in EXPLAIN as text
+EXPLAIN_DIALECT = postgresql.dialect(paramstyle="named")
+RELTUPLES_QUERY = text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)")
+
+
+async def estimate_count(session, query, table: Optional[str] = None) -> int:
+    """
+    Planner row estimate for `query`, or `pg_class.reltuples` of `table` when
+    the query is unfiltered (cheaper, refreshed by ANALYZE/autovacuum).
+    """
+    if table is not None:
+        estimate = (await session.execute(RELTUPLES_QUERY, {"table": table})).scalar()
+        # reltuples is -1 for tables that were never analyzed: ask the planner instead,
+        # which still estimates from the table's size on disk
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+
+    compiled = query.compile(dialect=EXPLAIN_DIALECT, compile_kwargs={"render_postcompile": True})
+    plan = (await session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(int(plan[0]["Plan"]["Plan Rows"]), 0)
+
+
+async def count_query(session, query, count: str = COUNT_EXACT, table: Optional[str] = None) -> Optional[int]:
+    if count == COUNT_NONE:
+        return None
+    if count == COUNT_ESTIMATE:
+        return await estimate_count(session, query, table)
     total_query = select(func.count()).select_from(query.subquery())
-    total = (await session.execute(total_query)).scalar()
+    return (await session.execute(total_query)).scalar()
+
+
+'''
+=====================================================
+# Paginate Query
+=====================================================
+'''
+async def paginate_query(session, query, page, size, count: str = COUNT_EXACT,
+                         total: Optional[int] = None, table: Optional[str] = None, mappings: bool = False):
+    """
+    `total` skips counting when it is already known (e.g. a cached exact count).
+    Otherwise an exact total rides along with the page as `count(*) OVER ()`,
+    so both come back in one round trip. `mappings` returns projected rows
+    (see `project_query`) instead of ORM objects.
+    """
+    window_count = total is None and count == COUNT_EXACT
+    if total is None and not window_count:
+        total = await count_query(session, query, count, table)
 
     # Apply Pagination Efficiently at the DB Level
     paginated_query = query.offset((page - 1) * size).limit(size)
+    if window_count:
+        paginated_query = paginated_query.add_columns(func.count().over().label("_total"))
 
     # Fetch only the required data
     results = await session.execute(paginated_query)
-    result = results.scalars().all()
+    if window_count or mappings:
+        rows = results.all()
+        result = [row._mapping if mappings else row[0] for row in rows]
+    if window_count:
+        if rows:
+            total = rows[0][-1]
+        elif page > 1:
+            # Past the last page there is no row to carry the window count
+            total = await count_query(session, query)
+        else:
+            total = 0
+    elif not mappings:
+        result = results.scalars().all()
 
     response_data = {
         "items": result,
         "total": total,
         "page": page,
         "size": size,
-        "pages": (total // size) + (1 if total % size else 0),
+        "pages": None if total is None else (total // size) + (1 if total % size else 0),
+        "total_exact": count == COUNT_EXACT,
     }
 
-    return response_data
\ No newline at end of file
+    return response_data
+
+
+'''
+=====================================================
+# Keyset (cursor) pagination
+=====================================================
+'''
+def encode_cursor(sort_value, record_id, sort: Optional[str], backward: bool = False) -> str:
+    """Opaque cursor pointing at a row: its sort value and id, plus the sort it belongs to."""
+    # Decimals stay exact as strings (jsonable_encoder would round them to floats), `_coerce` rebuilds them
+    value = str(sort_value) if isinstance(sort_value, Decimal) else jsonable_encoder(sort_value)
+    payload = {"v": value, "id": str(record_id), "s": sort or "", "b": backward}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, column, sort: Optional[str]) -> Tuple[Any, uuid.UUID, bool]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["s"] != (sort or ""):
+            raise ValueError("cursor belongs to another sort")
+        value = payload["v"]
+        if value is not None and column is not None:
+            value = _coerce(column, value)
+        return value, uuid.UUID(payload["id"]), bool(payload["b"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _coerce(column, value):
+    """Turn a JSON cursor value back into the column's Python type (datetimes, UUIDs, decimals)."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type in (datetime, date, time):
+        return python_type.fromisoformat(value)
+    if python_type in (uuid.UUID, Decimal):
+        return python_type(str(value))
+    return value
+
+
+def _seek(column, id_column, value, record_id, descending: bool):
+    """Rows strictly after (value, id) in ORDER BY column, id (NULLs last ascending, first descending)."""
+    after = operator.lt if descending else operator.gt
+    id_after = after(id_column, record_id)
+    if column is None:
+        return id_after
+    if value is None:
+        in_nulls = and_(column.is_(None), id_after)
+        return or_(column.is_not(None), in_nulls) if descending else in_nulls
+    condition = or_(after(column, value), and_(column == value, id_after))
+    return condition if descending else or_(condition, column.is_(None))
+
+
+def _order(column, id_column, descending: bool):
+    if column is None:
+        return [desc(id_column) if descending else asc(id_column)]
+    if descending:
+        return [desc(column).nulls_first(), desc(id_column)]
+    return [asc(column).nulls_last(), asc(id_column)]
+
+
+async def paginate_cursor(session, query, model, column, descending: bool,
+                          sort: Optional[str], cursor: Optional[str], size: int, mappings: bool = False):
+    """
+    Seek on (sort column, id) instead of OFFSET, so every page costs the same.
+    `query` must be unordered (see `Base.get_sorted_records`).
+    """
+    backward = False
+    if cursor:
+        value, record_id, backward = decode_cursor(cursor, column, sort)
+        # Walking backward seeks the reversed order from the cursor row
+        query = query.where(_seek(column, model.id, value, record_id, descending != backward))
+
+    if column is not None:
+        query = query.add_columns(column.label("_cursor_sort"))
+    query = query.order_by(*_order(column, model.id, descending != backward)).limit(size + 1)
+
+    rows = (await session.execute(query)).all()
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if backward:
+        rows.reverse()
+
+    def cursor_at(row, backward: bool) -> str:
+        sort_value = row[-1] if column is not None else None
+        record_id = row._mapping["id"] if mappings else row[0].id
+        return encode_cursor(sort_value, record_id, sort, backward)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backward:
+            next_cursor = cursor_at(rows[-1], False)
+        if (has_more and backward) or (cursor and not backward):
+            prev_cursor = cursor_at(rows[0], True)
+
+    return {
+        "items": [row._mapping if mappings else row[0] for row in rows],
+        "size": size,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
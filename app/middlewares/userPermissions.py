@@ -1,19 +1,24 @@
 from fastapi import Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from app.api.modules.auth.users.models import User, UserStatus
 from app.api.modules.auth.authentication.models import APIKey
 from app.middlewares.middleware_response import json_response_with_cors
-from app.utils.security import SECRET_KEY, ALGORITHM, hash_key
+from app.utils.security import decode_token, hash_key
 from logs.logging import logger
 from app.utils.token_blacklist import is_token_blacklisted
-from app.core.database.db import get_read_session
-from jose import JWTError, jwt
-from app.core.redis import redis_cache
+from app.core.database.db import get_read_session, request_session_scope
+from jose import JWTError
+from app.core.permissions import get_permission_matcher
+from app.core.principal import Principal, cache_api_key_principal, cache_principal, get_cached_api_key_principal, get_cached_principal, get_token_epoch, principal_from_claims
 from app.core.config import settings
+from app.core.timing import request_timings, timed
+from app.core.rate_limit import rate_limiter
+from typing import Optional
 import time
-import re
 
 # Determine if running in production
 ENV = settings.environment
@@ -23,63 +28,152 @@ ENV = settings.environment
 # Middleware for authenticating users via JWT or API Key.
 =====================================================
 '''
-class PermissionMiddleware(BaseHTTPMiddleware):
-
-    async def dispatch(self, request: Request, call_next):
+class PermissionMiddleware:
+    """
+    Pure ASGI middleware: the response is passed through untouched, only the
+    `http.response.start` message is intercepted to add `X-Response-Time`
+    and the `Server-Timing` phase breakdown.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
         path = request.url.path
         method = request.method
         start_time = time.perf_counter()
+        app_start_time = None
+
+        async def send_with_response_time(message: Message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                response_time = (now - start_time) * 1000
+                if app_start_time is not None:
+                    timings.add("app", (now - app_start_time) * 1000)
+                timings.add("total", response_time)
+
+                headers = MutableHeaders(scope=message)
+                headers["X-Response-Time"] = f"{response_time:.2f} ms"
+                headers["Server-Timing"] = timings.server_timing()
+                logger.bind(method=method, path=path, status=message["status"], **timings.log_fields()).info(
+                    f"Received request: {method} {path} - Response status: {message['status']}, Time taken: {response_time:.2f} ms")
+            await send(message)
+
+        # One lazily opened DB session per request, shared by auth and the route
+        with request_timings() as timings:
+            async with request_session_scope():
+                error_response = await self.authorize(request, path, method)
+                if error_response is None:
+                    app_start_time = time.perf_counter()
+                    await self.app(scope, receive, send_with_response_time)
+                else:
+                    await error_response(scope, receive, send_with_response_time)
 
+    '''
+    =====================================================
+    # Decide whether a request may reach the application.
+    # Returns an error response, or None to let it through.
+    =====================================================
+    '''
+    async def authorize(self, request: Request, path: str, method: str) -> Optional[Response]:
         # Allow OPTIONS requests (CORS support)
-        def log_and_return_response(response):
-            response_time = (time.perf_counter() - start_time) * 1000
-            response.headers["X-Response-Time"] = f"{response_time:.2f} ms"
-            logger.info(
-                f"Received request: {method} {path} - Response status: {response.status_code}, Time taken: {response_time:.2f} ms")
-            return response
-
         if method == "OPTIONS":
-            response = await call_next(request)
-            return log_and_return_response(response)
+            return None
 
         # Allow access to admin endpoints in development
         if path.startswith("/admin") or path.startswith("/public"):
-            response = await call_next(request)
-            return log_and_return_response(response)
+            return None
 
         # Allow access to documentation and OpenAPI schema in development
         if ENV == "development" and path.startswith(("/docs", "/redoc", "/openapi.json", "/favicon.ico")):
-            response = await call_next(request)
-            return log_and_return_response(response)
+            return None
 
         # Allow access to public endpoints or PUBLIC role (No authentication required)
-        if await self.check_permission("PUBLIC", path, method):
-            response = await call_next(request)
-            return log_and_return_response(response)
+        with timed("perm"):
+            is_public = self.check_permission("PUBLIC", path, method)
+        if is_public:
+            # Anonymous callers are limited per client IP before the route (e.g. bcrypt on login) runs
+            return await self.check_rate_limit(request, "PUBLIC", path, method)
+
+        # Throttle per client IP first, so invalid API keys and tokens never reach the database
+        error_response = await self.check_client_rate_limit(request)
+        if error_response:
+            return error_response
 
-        # Try to authenticate via API Key
-        user, error_response = await self.authenticate_api_key(request)
-        if not user:
-            # Fallback to JWT authentication
-            user, error_response = await self.authenticate_user(request)
+        with timed("auth"):
+            # Try to authenticate via API Key
+            user, error_response = await self.authenticate_api_key(request)
+            if not user:
+                # Fallback to JWT authentication
+                user, error_response = await self.authenticate_user(request)
 
         if error_response:
-            response = error_response
-            return log_and_return_response(response)
+            return error_response
 
         # Attach user object to request
         request.state.user = user
 
+        api_key = request.headers.get("X-API-Key")
+        error_response = await self.check_rate_limit(
+            request, user.role.name, path, method,
+            identity=f"user:{user.id}", api_key_hash=hash_key(api_key) if api_key else None)
+        if error_response:
+            return error_response
+
         # Check user role permissions
-        if await self.check_permission(user.role.name, path, method):
-            response = await call_next(request)
-        else:
-            response = json_response_with_cors(
-                content={"detail": "You do not have access to this resource"},
-                status_code=status.HTTP_403_FORBIDDEN
-            )
+        with timed("perm"):
+            is_allowed = self.check_permission(user.role.name, path, method)
+        if is_allowed:
+            return None
 
-        return log_and_return_response(response)
+        return json_response_with_cors(
+            content={"detail": "You do not have access to this resource"},
+            status_code=status.HTTP_403_FORBIDDEN
+        )
+
+    '''
+    =====================================================
+    # Apply role, route, API key and client IP rate limits.
+    =====================================================
+    '''
+    async def check_rate_limit(self, request: Request, role: str, path: str, method: str,
+                               identity: Optional[str] = None, api_key_hash: Optional[str] = None):
+        if not settings.rate_limit_enabled:
+            return None
+
+        identity = identity or f"ip:{self.client_ip(request)}"
+        with timed("rate"):
+            retry_after = await rate_limiter.hit(identity, role, path, method, api_key_hash)
+        return self.too_many_requests(retry_after)
+
+    async def check_client_rate_limit(self, request: Request):
+        if not settings.rate_limit_enabled:
+            return None
+
+        with timed("rate"):
+            retry_after = await rate_limiter.hit_client(self.client_ip(request))
+        return self.too_many_requests(retry_after)
+
+    @staticmethod
+    def client_ip(request: Request) -> str:
+        return request.client.host if request.client else "unknown"
+
+    @staticmethod
+    def too_many_requests(retry_after: Optional[int]) -> Optional[Response]:
+        if retry_after is None:
+            return None
+
+        response = json_response_with_cors(
+            content={"detail": "Too many requests. Please try again later."},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response.headers["Retry-After"] = str(retry_after)
+        return response
 
     '''
     =====================================================
@@ -91,9 +185,14 @@ class PermissionMiddleware(BaseHTTPMiddleware):
         if not api_key:
             return None, None  # No API key provided, continue to JWT authentication
 
+        hashed_key = hash_key(api_key)
+        principal = await get_cached_api_key_principal(hashed_key)
+        if principal:
+            return principal, None
+
         async for session in get_read_session():
             query = await session.execute(
-                select(APIKey).where(APIKey.key == hash_key(api_key)).options(
+                select(APIKey).where(APIKey.key == hashed_key).options(
                     selectinload(APIKey.user))
             )
             api_key_entry = query.scalar_one_or_none()
@@ -104,7 +203,9 @@ class PermissionMiddleware(BaseHTTPMiddleware):
                     status_code=status.HTTP_401_UNAUTHORIZED
                 )
 
-            return api_key_entry.user, None  # API Key valid, return user
+            principal = Principal.model_validate(api_key_entry.user)
+            await cache_api_key_principal(hashed_key, principal)
+            return principal, None  # API Key valid, return user
 
     '''
     =====================================================
@@ -130,14 +231,14 @@ class PermissionMiddleware(BaseHTTPMiddleware):
             )
 
         # Check if token is blacklisted
-        if is_token_blacklisted(token):
+        if await is_token_blacklisted(token):
             return None, json_response_with_cors(
                 content={"detail": "Token has been blacklisted"},
                 status_code=status.HTTP_401_UNAUTHORIZED
             )
 
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = decode_token(token)
         except JWTError:
             return None, json_response_with_cors(
                 content={"detail": "Invalid or expired token"},
@@ -153,32 +254,46 @@ class PermissionMiddleware(BaseHTTPMiddleware):
                 status_code=status.HTTP_401_UNAUTHORIZED
             )
 
-        # Fetch user from DB
-        async for session in get_read_session():
-            query = await session.execute(
-                select(User).where(User.id == user_id).options(
-                    selectinload(User.role))
+        # Tokens carrying an epoch are revoked once the user's epoch is bumped
+        if "epoch" in payload and payload["epoch"] != await get_token_epoch(user_id):
+            return None, json_response_with_cors(
+                content={"detail": "Token has been revoked"},
+                status_code=status.HTTP_401_UNAUTHORIZED
             )
-            user = query.scalar_one_or_none()
-            if not user:
-                return None, json_response_with_cors(
-                    content={"detail": "User not found"},
-                    status_code=status.HTTP_401_UNAUTHORIZED
-                )
 
-            # Verify user status
-            error_response = self.verify_user_status(user, request)
-            if error_response:
-                return None, error_response
+        # Resolve the principal from cache, then from role/status claims, falling back to the DB
+        user = await get_cached_principal(user_id)
+        if user is None and payload.get("status") and payload.get("role"):
+            user = principal_from_claims(payload)
+        if user is None:
+            async for session in get_read_session():
+                query = await session.execute(
+                    select(User).where(User.id == user_id).options(
+                        selectinload(User.role))
+                )
+                db_user = query.scalar_one_or_none()
+                if not db_user:
+                    return None, json_response_with_cors(
+                        content={"detail": "User not found"},
+                        status_code=status.HTTP_401_UNAUTHORIZED
+                    )
+
+                user = Principal.model_validate(db_user)
+                await cache_principal(user)
+
+        # Verify user status
+        error_response = self.verify_user_status(user, request)
+        if error_response:
+            return None, error_response
 
-            return user, None
+        return user, None
 
     '''
     =====================================================
     # Verify user status before allowing access.
     =====================================================
     '''
-    def verify_user_status(self, user: User, request: Request):
+    def verify_user_status(self, user: Principal, request: Request):
         if user.status == UserStatus.PAUSED.value and request.method not in ["GET", "OPTIONS", "HEAD"]:
             return json_response_with_cors(
                 content={
@@ -207,25 +322,5 @@ class PermissionMiddleware(BaseHTTPMiddleware):
     # Check if a role has permission to access a route.
     =====================================================
     '''
-    async def check_permission(self, role: str, path: str, method: str):
-        permission_data = await redis_cache.get("permission_cache")
-
-        if not permission_data or role not in permission_data:
-            return False
-
-        for public_path in permission_data[role]:
-            pattern = "^" + self.path_to_regex(public_path) + "$"
-            if re.match(pattern, path) and method in permission_data[role][public_path]:
-                return True
-
-        return False  # Deny access if no match
-
-    '''
-    =====================================================
-    # Convert API path parameters to regex patterns.
-    =====================================================
-    '''
-    def path_to_regex(self, path: str):
-        path = re.sub(r"\{[^/:]+\}", r"[^/]+", path)
-        path = re.sub(r"\{[^/:]+:path\}", r".+", path)
-        return path
+    def check_permission(self, role: str, path: str, method: str):
+        return get_permission_matcher().allows(role, path, method)
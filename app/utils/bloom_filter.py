@@ -0,0 +1,30 @@
+from typing import Iterable
+import hashlib
+import math
+
+'''
+=====================================================
+# Bloom filter for fast negative membership checks
+=====================================================
+'''
+class BloomFilter:
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001, items: Iterable[str] = ()):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        for item in items:
+            self.add(item)
+
+    def _positions(self, item: str):
+        # Double hashing: two 64-bit halves of a SHA-256 digest give all k positions
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
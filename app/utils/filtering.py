@@ -1,4 +1,5 @@
 import json
+import hashlib
 from typing import Dict, Optional, Tuple, Any
 from fastapi import HTTPException
 from sqlalchemy import and_, or_, DateTime
@@ -213,4 +214,101 @@ def parse_filter_query(filters: Optional[str]) -> Optional[Dict]:
             raise ValueError("Filters should be a valid JSON object (dictionary).")
         return parsed_filters
     except (json.JSONDecodeError, ValueError) as e:
-        raise HTTPException(status_code=400, detail=f"Invalid filter JSON: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Invalid filter JSON: {str(e)}")
+
+'''
+=====================================================
+# Canonical Query Fingerprint (cache keys)
+=====================================================
+'''
+OPERATOR_ALIASES = {"$isanyof": "$in"}  # Operators with identical semantics
+UNORDERED_OPERATORS = {"$in"}
+CANONICAL_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _field_type(model, key: str):
+    """Column type behind a (possibly nested `a__b`) filter key, or None if unresolvable."""
+    current_model = model
+    for attr in key.split("__"):
+        attribute = getattr(current_model, attr, None)
+        if attribute is None or not hasattr(attribute, "property"):
+            return None
+        if isinstance(attribute.property, RelationshipProperty):
+            current_model = attribute.property.mapper.class_
+        else:
+            return getattr(attribute, "type", None)
+    return None
+
+
+def _canonical_value(value: Any, is_datetime: bool) -> Any:
+    # Full timestamps in any accepted format compare equal; date-only values keep their day-range meaning
+    if is_datetime and isinstance(value, str) and ("T" in value or " " in value):
+        try:
+            return _parse_datetime(value).strftime(CANONICAL_DATETIME_FORMAT)
+        except HTTPException:
+            return value
+    return value
+
+
+def _canonical_filters(model, filters: Any) -> Any:
+    if not isinstance(filters, dict):
+        return filters
+
+    canonical = {}
+    for key, value in filters.items():
+        if key in LOGICAL_OPERATORS and isinstance(value, list):
+            # $and/$or are commutative
+            canonical[key] = sorted((_canonical_filters(model, sub) for sub in value), key=_dump)
+        elif isinstance(value, dict):
+            is_datetime = isinstance(_field_type(model, key), DateTime)
+            operands = {}
+            for operator, operand in value.items():
+                operator = OPERATOR_ALIASES.get(operator, operator)
+                if operator in ("$isempty", "$isnotempty"):
+                    operand = True  # The operand is ignored
+                elif isinstance(operand, list):
+                    operand = [_canonical_value(v, is_datetime) for v in operand]
+                    if operator in UNORDERED_OPERATORS:
+                        operand = sorted({_dump(v): v for v in operand}.values(), key=_dump)
+                else:
+                    operand = _canonical_value(operand, is_datetime)
+                operands.setdefault(operator, []).append(operand)
+
+            conditions = {}
+            for operator, values in operands.items():
+                if len(values) == 1:
+                    conditions[operator] = values[0]
+                else:
+                    # Aliased operators on one field are ANDed: keep every operand. The
+                    # "+" suffix is not a valid operator, so no single condition can match it
+                    conditions[f"{operator}+"] = sorted(values, key=_dump)
+            canonical[key] = conditions
+        else:
+            canonical[key] = value
+    return canonical
+
+
+def query_fingerprint(model, filters: Optional[str], sort: Optional[str], search: Optional[str]) -> str:
+    """
+    Stable hash of a list query. Filters are parsed and canonicalised (sorted
+    keys, operator aliases, unordered `$in` values, normalised timestamps),
+    `sort` defaults its direction and `search` is lower-cased (it is matched
+    with ILIKE), so equivalent requests share one cache entry.
+    """
+    parsed_filters = parse_filter_query(filters) or {}
+
+    sort_key = None
+    if sort:
+        sort_field, _, sort_direction = sort.partition(":")
+        sort_key = f"{sort_field}:{'asc' if sort_direction.lower() in ('', 'asc') else 'desc'}"
+
+    canonical = {
+        "filters": _canonical_filters(model, parsed_filters),
+        "sort": sort_key,
+        "search": search.lower() if search else None,
+    }
+    return hashlib.sha256(_dump(canonical).encode()).hexdigest()[:32]
@@ -0,0 +1,150 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+'''
+=====================================================
+# HTTP method bitmask
+=====================================================
+'''
+METHOD_BITS = {
+    "GET": 1 << 0,
+    "POST": 1 << 1,
+    "PUT": 1 << 2,
+    "PATCH": 1 << 3,
+    "DELETE": 1 << 4,
+    "HEAD": 1 << 5,
+    "OPTIONS": 1 << 6,
+    "TRACE": 1 << 7,
+    "CONNECT": 1 << 8,
+}
+
+
+def method_bit(method: str) -> int:
+    """Return the bit for an HTTP method, allocating one for unknown methods."""
+    method = method.upper()
+    bit = METHOD_BITS.get(method)
+    if bit is None:
+        bit = METHOD_BITS[method] = 1 << len(METHOD_BITS)
+    return bit
+
+
+'''
+=====================================================
+# Convert API path parameters to regex patterns.
+=====================================================
+'''
+def path_to_regex(path: str):
+    path = re.sub(r"\{[^/:]+\}", r"[^/]+", path)
+    path = re.sub(r"\{[^/:]+:path\}", r".+", path)
+    return path
+
+
+PARAM_SEGMENT = re.compile(r"^\{[^/:{}]+\}$")
+PATH_SEGMENT = re.compile(r"^\{[^/:{}]+:path\}$")
+
+
+'''
+=====================================================
+# Segment trie node
+=====================================================
+'''
+class _Node:
+    __slots__ = ("static", "param", "methods", "path_methods")
+
+    def __init__(self):
+        self.static: Dict[str, "_Node"] = {}
+        self.param: Optional["_Node"] = None
+        self.methods = 0        # Methods allowed when the path ends here
+        self.path_methods = 0   # Methods allowed for a trailing {name:path}
+
+
+'''
+=====================================================
+# Route trie for a single role
+=====================================================
+'''
+class RouteTrie:
+    """
+    Segment trie over route patterns with `{param}` and trailing `{param:path}`
+    wildcards. Lookups walk the request path once, so the cost grows with the
+    number of path segments instead of the number of stored routes.
+    Patterns the trie cannot express (e.g. `/files/{name}.png`) fall back to
+    precompiled regexes.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.fallback: List[Tuple[re.Pattern, int]] = []
+
+    def add(self, route: str, methods: Iterable[str]):
+        mask = 0
+        for method in methods:
+            mask |= method_bit(method)
+
+        segments = route.split("/")
+        node = self.root
+        for index, segment in enumerate(segments):
+            if PATH_SEGMENT.match(segment):
+                if index != len(segments) - 1:
+                    break
+                node.path_methods |= mask
+                return
+            if PARAM_SEGMENT.match(segment):
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            elif "{" in segment or "}" in segment:
+                break
+            else:
+                node = node.static.setdefault(segment, _Node())
+        else:
+            node.methods |= mask
+            return
+
+        self.fallback.append((re.compile("^" + path_to_regex(route) + "$"), mask))
+
+    def match(self, path: str, method: str) -> bool:
+        bit = METHOD_BITS.get(method.upper())
+        if bit is None:
+            return False
+        if self._match(self.root, path.split("/"), 0, bit):
+            return True
+        return any(mask & bit and pattern.match(path) for pattern, mask in self.fallback)
+
+    def _match(self, node: _Node, segments: List[str], index: int, bit: int) -> bool:
+        if index == len(segments):
+            return bool(node.methods & bit)
+
+        # {name:path} needs at least one character left to consume
+        if node.path_methods & bit and "/".join(segments[index:]):
+            return True
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None and self._match(child, segments, index + 1, bit):
+            return True
+
+        if node.param is not None and segment:
+            return self._match(node.param, segments, index + 1, bit)
+
+        return False
+
+
+'''
+=====================================================
+# Compiled permission matcher (role -> route trie)
+=====================================================
+'''
+class PermissionMatcher:
+    def __init__(self, permission_data: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.roles: Dict[str, RouteTrie] = {}
+        for role, routes in (permission_data or {}).items():
+            trie = self.roles[role] = RouteTrie()
+            for route, methods in routes.items():
+                trie.add(route, methods)
+
+    def allows(self, role: str, path: str, method: str) -> bool:
+        trie = self.roles.get(role)
+        if trie is None:
+            return False
+        return trie.match(path, method)
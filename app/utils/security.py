@@ -3,9 +3,11 @@ import os
 from typing import Optional
 from jose import jwt
 from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
 import hashlib
 import hmac
 import base64
+import time
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.backends import default_backend
@@ -14,6 +16,10 @@ SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
+# Verified payloads keyed by token digest, each expiring at the token's `exp`
+DECODED_TOKEN_CACHE_SIZE = 10000
+_decoded_tokens = TTLCache(maxsize=DECODED_TOKEN_CACHE_SIZE)
+
 
 '''
 =====================================================
@@ -38,7 +44,32 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 =====================================================
 '''
 def decode_token(token: str):
-    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    """
+    Verify and decode a JWT. Verified payloads are cached until the token
+    expires, so a reused token skips signature verification and JSON parsing.
+    """
+    key = token_digest(token)
+    payload = _decoded_tokens.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = payload.get("exp")
+        if exp:
+            _decoded_tokens.set(key, payload, ttl=exp - time.time())
+    return dict(payload)
+
+
+def decode_cache_stats() -> dict:
+    """Size, hit and miss counters of the verified-token cache."""
+    return _decoded_tokens.stats()
+
+
+'''
+=====================================================
+# Token digest (used instead of raw tokens in caches and logs)
+=====================================================
+'''
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
 
 '''
@@ -1,33 +1,53 @@
-from typing import Dict
 from datetime import datetime, timezone, UTC
 from jose import jwt
-from app.core.config import settings
+from app.core.redis import redis_cache
+from app.utils.bloom_filter import BloomFilter
+from app.utils.security import decode_token, token_digest
 from logs.logging import logger
 
-SECRET_KEY = settings.secret_key
-ALGORITHM = settings.algorithm
+BLACKLIST_KEY_PREFIX = "token_blacklist:"  # One key per revoked token digest, expiring with the token
+BLACKLIST_INDEX_KEY = "token_blacklist_index"  # Sorted set of digests scored by expiry
+BLACKLIST_CHANNEL = "token_blacklist_updates"  # Pub/Sub channel for newly revoked digests
+BLOOM_CAPACITY = 100_000
+BLOOM_ERROR_RATE = 0.001
+
+# Local Bloom filter answering the common "not revoked" case without a network call.
+# "next" holds a filter being rebuilt so digests announced meanwhile are not lost.
+_filters = {"current": BloomFilter(BLOOM_CAPACITY, BLOOM_ERROR_RATE), "next": None}
+
+
+def _remember(digest: str):
+    _filters["current"].add(digest)
+    if _filters["next"] is not None:
+        _filters["next"].add(digest)
 
-token_blacklist: Dict[str, datetime] = {}
 
 '''
 =====================================================
 # Add token to blacklist
 =====================================================
 '''
-def add_token_to_blacklist(token: str):
+async def add_token_to_blacklist(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         exp_timestamp = payload.get("exp")
         if exp_timestamp:
             expiration = datetime.fromtimestamp(exp_timestamp, tz=UTC)
-            token_blacklist[token] = expiration
+            ttl = int(exp_timestamp - datetime.now(timezone.utc).timestamp()) + 1
+            digest = token_digest(token)
+
+            async with redis_cache.pipeline() as pipe:
+                pipe.set(f"{BLACKLIST_KEY_PREFIX}{digest}", 1, ttl=ttl)
+                pipe.zadd(BLACKLIST_INDEX_KEY, {digest: exp_timestamp})
+                pipe.publish(BLACKLIST_CHANNEL, digest)
+            _remember(digest)
             logger.info(
-                f"Token '{token}' added to blacklist. Expires at {expiration.strftime('%Y-%m-%d %H:%M:%S')}.")
+                f"Token {digest[:12]} added to blacklist. Expires at {expiration.strftime('%Y-%m-%d %H:%M:%S')}.")
         else:
             logger.warning("Token does not contain an expiration field.")
     except jwt.ExpiredSignatureError:
         logger.warning("Token has expired.")
-    except jwt.InvalidTokenError:
+    except jwt.JWTError:
         logger.error("Invalid token.")
 
 
@@ -36,24 +56,46 @@ def add_token_to_blacklist(token: str):
 # Check if token is blacklisted
 =====================================================
 '''
-def is_token_blacklisted(token: str) -> bool:
-    if token in token_blacklist:
-        if datetime.now(timezone.utc) < token_blacklist[token]:
-            return True
-        else:
-            del token_blacklist[token]
-    return False
+async def is_token_blacklisted(token: str) -> bool:
+    digest = token_digest(token)
+    if digest not in _filters["current"]:
+        return False
+    # Possible hit (or false positive): confirm against Redis
+    return await redis_cache.exists(f"{BLACKLIST_KEY_PREFIX}{digest}")
+
+
+'''
+=====================================================
+# Cleanup expired tokens and rebuild the local Bloom filter
+=====================================================
+'''
+async def cleanup_expired_tokens():
+    now = datetime.now(timezone.utc).timestamp()
+    removed = await redis_cache.zremrangebyscore(BLACKLIST_INDEX_KEY, "-inf", now)
+    if removed:
+        logger.info(f"{removed} expired tokens removed from blacklist.")
+
+    _filters["next"] = BloomFilter(BLOOM_CAPACITY, BLOOM_ERROR_RATE)
+    try:
+        for digest in await redis_cache.zrangebyscore(BLACKLIST_INDEX_KEY, now, "+inf"):
+            _filters["next"].add(digest.decode() if isinstance(digest, bytes) else digest)
+        _filters["current"] = _filters["next"]
+    finally:
+        _filters["next"] = None
 
 
 '''
 =====================================================
-# Cleanup expired tokens
+# Keep the local Bloom filter in sync with other workers
 =====================================================
 '''
-def cleanup_expired_tokens():
-    now = datetime.now(timezone.utc)
-    tokens_to_remove = [token for token,
-                        expiry in token_blacklist.items() if now >= expiry]
-    for token in tokens_to_remove:
-        del token_blacklist[token]
-        logger.info(f"Token '{token}' removed from blacklist.")
+async def watch_blacklist():
+    async for digest in redis_cache.subscribe(BLACKLIST_CHANNEL):
+        if digest is None:
+            # (Re)subscribed: revocations may have been missed
+            try:
+                await cleanup_expired_tokens()
+            except Exception as e:
+                logger.error(f"Error rebuilding token blacklist filter: {e}")
+        else:
+            _remember(digest)
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import time
+
+'''
+=====================================================
+# Bounded in-process LRU cache with per-entry expiry
+=====================================================
+'''
+class TTLCache:
+    """
+    `maxweight` optionally bounds the summed entry weights as well (e.g. bytes,
+    passed to `set`), entries heavier than the whole budget are not stored.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, maxweight: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any, int]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it as recently used."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, weight: int = 1):
+        """Store an entry, evicting the least recently used ones when full."""
+        ttl = self.ttl if ttl is None else ttl
+        self.delete(key)
+        if ttl <= 0 or (self.maxweight is not None and weight > self.maxweight):
+            return
+        self._data[key] = (time.monotonic() + ttl, value, weight)
+        self.weight += weight
+        while len(self._data) > self.maxsize or (self.maxweight is not None and self.weight > self.maxweight):
+            _, (_, _, evicted_weight) = self._data.popitem(last=False)
+            self.weight -= evicted_weight
+
+    def delete(self, key: Hashable):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.weight -= entry[2]
+
+    def clear(self):
+        self._data.clear()
+        self.weight = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "weight": self.weight, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._data)
@@ -1,12 +1,14 @@
 from app.core.database.db import master_db_engine, get_read_session
 from app.middlewares.userPermissions import PermissionMiddleware
 from app.admin.ui.template_generator import generate_template
-from app.utils.token_blacklist import cleanup_expired_tokens
+from app.utils.token_blacklist import cleanup_expired_tokens, watch_blacklist
 from app.middlewares.http_bearer import get_current_user
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.permissions import load_permissions
+from app.core.permissions import load_permissions, watch_permissions
+from app.core.principal import watch_principals
 from app.utils.base_path import path_conversion
 from fastapi.responses import RedirectResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 from fastapi import FastAPI, Depends, Request
 from app.core.database.base_model import Base
 from fastapi.staticfiles import StaticFiles
@@ -92,12 +94,20 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Middleware to enforce root_path
-@app.middleware("http")
-async def enforce_root_path(request: Request, call_next):
-    if not request.url.path.startswith(settings.base_path):
-        return RedirectResponse(url=path_conversion(request.url.path))
-    return await call_next(request)
+# Middleware to enforce root_path (pure ASGI, responses are passed through untouched)
+class EnforceRootPathMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            path = Request(scope).url.path
+            if not path.startswith(settings.base_path):
+                await RedirectResponse(url=path_conversion(path))(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(EnforceRootPathMiddleware)
 
 # Middleware to enforce permissions
 app.add_middleware(PermissionMiddleware)
@@ -122,7 +132,7 @@ async def start_periodic_cleanup():
         try:
             logger.info(
                 f'[*] FastAPI startup: Cleaning expired Tokens {datetime.now()}')
-            cleanup_expired_tokens()
+            await cleanup_expired_tokens()
         except Exception as e:
             logger.error(f'Error during token cleanup: {e}')
 
@@ -153,6 +163,19 @@ async def lifespan(app: FastAPI):
     # Periodically refresh permissions in Redis every 10 minutes
     asyncio.create_task(refresh_permissions())
 
+    # Reload the in-process permission snapshot when another worker publishes a new version
+    asyncio.create_task(watch_permissions())
+
+    # Keep the in-process L1 in front of Redis coherent across workers
+    asyncio.create_task(redis_cache.watch_l1())
+
+    # Evict cached principals invalidated by other workers
+    asyncio.create_task(watch_principals())
+
+    # Load revoked tokens into the local Bloom filter and follow new revocations
+    await cleanup_expired_tokens()
+    asyncio.create_task(watch_blacklist())
+
     # Dynamically generate and include routers for all models
     models = get_models()
     for model in models:
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+from sqlalchemy import column, select, table
+from app.generator.utils import pagination
+import asyncio
+import json
+
+STATES = table("states", column("id"), column("name"))
+
+
+class FakeSession:
+    """Answers the reltuples lookup and EXPLAIN, recording which statements ran."""
+
+    def __init__(self, reltuples, plan_rows):
+        self.reltuples = reltuples
+        self.plan_rows = plan_rows
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if statement is pagination.RELTUPLES_QUERY:
+            value = self.reltuples
+        elif sql.startswith("EXPLAIN"):
+            value = json.dumps([{"Plan": {"Plan Rows": self.plan_rows}}])
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+        return SimpleNamespace(scalar=lambda: value)
+
+
+def test_estimate_uses_reltuples_for_analyzed_tables():
+    session = FakeSession(reltuples=1200.0, plan_rows=5)
+    assert asyncio.run(pagination.estimate_count(session, select(STATES), table="states")) == 1200
+    assert len(session.statements) == 1
+
+
+def test_estimate_falls_back_to_planner_for_unanalyzed_tables():
+    session = FakeSession(reltuples=-1.0, plan_rows=23)
+    assert asyncio.run(pagination.estimate_count(session, select(STATES), table="states")) == 23
+    assert session.statements[-1].startswith("EXPLAIN (FORMAT JSON) SELECT")
+
+
+def test_estimate_of_filtered_query_uses_planner():
+    session = FakeSession(reltuples=1200.0, plan_rows=7)
+    query = select(STATES).where(STATES.c.name == "Kerala")
+    assert asyncio.run(pagination.estimate_count(session, query)) == 7
+    assert len(session.statements) == 1
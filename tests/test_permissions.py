@@ -0,0 +1,98 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from app.core import permissions
+from app.core.cache_codec import CacheCodec, FORMAT_LEGACY
+import asyncio
+import json
+import re
+
+
+class FakePipeline:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def set(self, key, value, ttl=None, raw=False, compress_threshold=None):
+        self.cache.store[key] = self.cache.codec.encode(value, raw=raw)
+
+
+class FakeRedisCache:
+    """Just enough of RedisCache for load_permissions / sync_permissions."""
+
+    def __init__(self):
+        self.codec = CacheCodec(write_format=FORMAT_LEGACY)
+        self.store = {}
+        self.counters = {}
+        self.published = []
+
+    async def incr(self, key):
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    @asynccontextmanager
+    async def pipeline(self):
+        yield FakePipeline(self)
+
+    async def get(self, key):
+        return self.codec.decode(self.store.get(key))
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, query):
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.rows))
+
+
+def role_permission(role, route, method):
+    return SimpleNamespace(role=SimpleNamespace(name=role), route=route, method=method)
+
+
+def legacy_check_permission(raw, role, path, method):
+    """The permission check of releases before the versioned snapshot, verbatim."""
+    permission_data = json.loads(raw.decode())  # Older workers read with decode_responses + json.loads
+    if not permission_data or role not in permission_data:
+        return False
+    for public_path in permission_data[role]:
+        regex = re.sub(r"\{[^/:]+\}", r"[^/]+", public_path)
+        regex = re.sub(r"\{[^/:]+:path\}", r".+", regex)
+        if re.match("^" + regex + "$", path) and method in permission_data[role][public_path]:
+            return True
+    return False
+
+
+def load(monkeypatch, rows):
+    cache = FakeRedisCache()
+    monkeypatch.setattr(permissions, "redis_cache", cache)
+    asyncio.run(permissions.load_permissions(FakeSession(rows)))
+    return cache
+
+
+def test_legacy_permission_cache_is_readable_by_older_workers(monkeypatch):
+    cache = load(monkeypatch, [
+        role_permission("PUBLIC", "/api/auth/login", "POST"),
+        role_permission("USER", "/api/users/{id}", "GET"),
+        role_permission("USER", "/api/users/{id}", "PATCH"),
+    ])
+
+    raw = cache.store[permissions.PERMISSION_CACHE_KEY]
+    assert json.loads(raw.decode()) == {
+        "PUBLIC": {"/api/auth/login": ["POST"]},
+        "USER": {"/api/users/{id}": ["GET", "PATCH"]},
+    }
+    assert legacy_check_permission(raw, "PUBLIC", "/api/auth/login", "POST")
+    assert legacy_check_permission(raw, "USER", "/api/users/42", "PATCH")
+    assert not legacy_check_permission(raw, "USER", "/api/users/42", "DELETE")
+    assert not legacy_check_permission(raw, "ADMIN", "/api/users/42", "GET")
+
+
+def test_versioned_snapshot_is_stored_under_its_own_key(monkeypatch):
+    cache = load(monkeypatch, [role_permission("USER", "/api/users/{id}", "GET")])
+
+    snapshot = asyncio.run(cache.get(permissions.PERMISSION_SNAPSHOT_KEY))
+    assert snapshot["permissions"] == {"USER": {"/api/users/{id}": ["GET"]}}
+    assert cache.published == [(permissions.PERMISSION_CHANNEL, snapshot["version"])]
+    assert permissions.get_permission_matcher().allows("USER", "/api/users/7", "GET")
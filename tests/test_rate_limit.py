@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+from starlette.requests import Request
+from app.core import rate_limit
+from app.core.rate_limit import RateLimiter
+from app.middlewares import userPermissions
+from app.middlewares.userPermissions import PermissionMiddleware
+import asyncio
+
+
+class FakeRedisCache:
+    """Token buckets without refill: each key allows `capacity` hits."""
+
+    def __init__(self):
+        self.used = {}
+
+    async def run_script(self, script, keys, args):
+        capacities = args[0::2]
+        if any(self.used.get(key, 0) >= capacity for key, capacity in zip(keys, capacities)):
+            return 60000
+        for key in keys:
+            self.used[key] = self.used.get(key, 0) + 1
+        return 0
+
+
+class FakeSession:
+    def __init__(self):
+        self.lookups = 0
+
+    async def execute(self, query):
+        self.lookups += 1
+        return SimpleNamespace(scalar_one_or_none=lambda: None)
+
+
+def api_key_request(client_ip, api_key):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/users",
+        "headers": [(b"x-api-key", api_key.encode())],
+        "client": (client_ip, 50000),
+        "query_string": b"",
+    })
+
+
+def test_repeated_invalid_api_keys_are_throttled_before_lookup(monkeypatch):
+    session = FakeSession()
+
+    async def get_read_session():
+        yield session
+
+    async def no_cached_principal(hashed_key):
+        return None
+
+    monkeypatch.setattr(rate_limit, "redis_cache", FakeRedisCache())
+    monkeypatch.setattr(userPermissions, "rate_limiter", RateLimiter(roles={}, routes={}, client="3/minute"))
+    monkeypatch.setattr(userPermissions, "get_read_session", get_read_session)
+    monkeypatch.setattr(userPermissions, "get_cached_api_key_principal", no_cached_principal)
+    middleware = PermissionMiddleware(app=None)
+
+    async def attempt(client_ip, api_key):
+        response = await middleware.authorize(api_key_request(client_ip, api_key), "/api/users", "GET")
+        return response.status_code, response.headers.get("Retry-After")
+
+    statuses = [asyncio.run(attempt("203.0.113.7", f"invalid-{i}")) for i in range(5)]
+
+    assert statuses == [(401, None)] * 3 + [(429, "60")] * 2
+    assert session.lookups == 3  # Throttled attempts never reach the database
+    assert asyncio.run(attempt("198.51.100.2", "invalid"))[0] == 401  # Other clients are unaffected